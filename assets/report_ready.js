@@ -0,0 +1,54 @@
+// Sets window.__REPORT_READY__ (and data-report-ready on <html>) once the report
+// is in the DOM, every image is decoded, graphs are drawn and fonts are loaded.
+// Dash serves this file from assets/, static pages include it at the end of <body>.
+(function () {
+    function layoutMounted() {
+        var content = document.getElementById('_dash-app-content');
+        if (!content || !content.firstElementChild || document.querySelector('._dash-loading')) {
+            return false;
+        }
+        if (document.querySelector('.dash-graph--pending, [data-dash-is-loading="true"]')) {
+            return false;
+        }
+        // Report server fills this container from a callback after the first render
+        var reportContent = document.getElementById('report-content');
+        if (reportContent && !reportContent.firstElementChild) {
+            return false;
+        }
+        var graphs = document.querySelectorAll('.dash-graph');
+        for (var i = 0; i < graphs.length; i++) {
+            if (!graphs[i].querySelector('.main-svg')) {
+                return false;
+            }
+        }
+        return true;
+    }
+
+    function waitForLayout() {
+        return new Promise(function (resolve) {
+            (function check() {
+                if (layoutMounted()) {
+                    resolve();
+                } else {
+                    setTimeout(check, 50);
+                }
+            })();
+        });
+    }
+
+    function imagesDecoded() {
+        return Promise.all(Array.prototype.map.call(document.images, function (img) {
+            // A broken image must not block the report forever
+            return img.decode ? img.decode().catch(function () {}) : null;
+        }));
+    }
+
+    waitForLayout()
+        .then(function () {
+            return Promise.all([imagesDecoded(), document.fonts ? document.fonts.ready : null]);
+        })
+        .then(function () {
+            window.__REPORT_READY__ = true;
+            document.documentElement.setAttribute('data-report-ready', 'true');
+        });
+})();
@@ -0,0 +1,339 @@
+import atexit
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+CHROME_BINARY = os.environ.get("CHROME_BIN", "/usr/bin/chromium")
+# Checked in order; nothing is downloaded, so the service works without network
+CHROMEDRIVER_CANDIDATES = (
+    os.environ.get("CHROMEDRIVER_PATH"),
+    shutil.which("chromedriver"),
+    "/usr/bin/chromedriver",
+    "/usr/lib/chromium/chromedriver",
+)
+
+BROWSER_POOL_SIZE = 2       # warm browsers kept per process
+BROWSER_MAX_JOBS = 50       # browser is restarted after this many reports
+LEASE_TIMEOUT = 120         # seconds to wait for a free browser
+REPORT_READY_TIMEOUT = 30   # seconds to wait for the page to signal it is ready to print
+
+# Set by assets/report_ready.js once layout, images, graphs and fonts are done
+READY_FLAG_SCRIPT = "return window.__REPORT_READY__ === true;"
+# Main frame lifecycle events required before printing
+READY_LIFECYCLE_EVENTS = {"load", "networkIdle"}
+
+
+def find_chromedriver():
+    """Path to a local chromedriver binary (CHROMEDRIVER_PATH may also point to its directory)"""
+    for candidate in CHROMEDRIVER_CANDIDATES:
+        if not candidate:
+            continue
+        if os.path.isdir(candidate):
+            candidate = os.path.join(candidate, "chromedriver")
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    raise FileNotFoundError(
+        "chromedriver not found, checked: "
+        + ", ".join(c for c in CHROMEDRIVER_CANDIDATES if c)
+    )
+
+
+def find_free_port():
+    """Free TCP port on localhost picked by the OS"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def chrome_options(debug_port):
+    """Headless Chromium options used for report printing"""
+    options = Options()
+    options.binary_location = CHROME_BINARY
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--disable-setuid-sandbox")
+    options.add_argument(f"--remote-debugging-port={debug_port}")
+
+    # Improved font configuration
+    options.add_argument("--disable-font-subpixel-positioning")
+    options.add_argument("--disable-remote-fonts")
+    options.add_argument("--force-color-profile=srgb")
+
+    # Set default fonts
+    font_prefs = {
+        "webkit.webprefs.default_fixed_font_size": 13,
+        "webkit.webprefs.default_font_size": 16,
+        "webkit.webprefs.minimum_font_size": 12,
+        "webkit.webprefs.minimum_logical_font_size": 12,
+        "webkit.webprefs.default_font_family": "Calibri",
+        "webkit.webprefs.sansserif_font_family": "Calibri",
+        "webkit.webprefs.serif_font_family": "Times New Roman",
+        "webkit.webprefs.fixed_font_family": "Consolas"
+    }
+    options.add_experimental_option("prefs", font_prefs)
+
+    # CDP events (page lifecycle) are read back through the performance log
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+
+def create_chrome_driver(debug_port=None):
+    """Start headless Chromium with a local chromedriver, on its own debugging port"""
+    debug_port = debug_port or find_free_port()
+    driver = webdriver.Chrome(
+        service=Service(find_chromedriver()),
+        options=chrome_options(debug_port),
+    )
+    driver.set_page_load_timeout(55)
+    driver.set_script_timeout(40)
+    return driver
+
+
+def _read_cdp_events(driver):
+    """CDP events buffered by chromedriver since the last call, as (method, params)"""
+    events = []
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        events.append((message.get("method"), message.get("params", {})))
+    return events
+
+
+def load_report_page(driver, url, timeout=REPORT_READY_TIMEOUT, poll_interval=0.1):
+    """
+    Open url and wait until it can be printed: the main frame has fired
+    load and networkIdle lifecycle events and the page set window.__REPORT_READY__.
+
+    Returns True when ready, False if timeout ran out first (the page is left open,
+    so the caller can still print what is there).
+    """
+    driver.execute_cdp_cmd("Page.enable", {})
+    driver.execute_cdp_cmd("Page.setLifecycleEventsEnabled", {"enabled": True})
+    _read_cdp_events(driver)  # drop events of the previous page
+
+    deadline = time.monotonic() + timeout
+    driver.get(url)
+    main_frame = driver.execute_cdp_cmd("Page.getFrameTree", {})["frameTree"]["frame"]["id"]
+
+    lifecycle = set()
+    while True:
+        for method, params in _read_cdp_events(driver):
+            if method != "Page.lifecycleEvent" or params.get("frameId") != main_frame:
+                continue
+            if params.get("name") == "init":
+                # New document in the frame, earlier events do not count
+                lifecycle.clear()
+            lifecycle.add(params.get("name"))
+
+        page_ready = driver.execute_script(READY_FLAG_SCRIPT)
+        if page_ready and READY_LIFECYCLE_EVENTS <= lifecycle:
+            return True
+        if time.monotonic() >= deadline:
+            print(f"Report page is not ready after {timeout} s: "
+                  f"ready flag={page_ready}, lifecycle events={sorted(lifecycle)}")
+            return False
+        time.sleep(poll_interval)
+
+
+class PooledBrowser:
+    """Browser in the pool and how much it has been used"""
+
+    def __init__(self, driver, debug_port):
+        self.driver = driver
+        self.debug_port = debug_port
+        self.jobs = 0
+        self.started_at = time.time()
+
+    def is_alive(self):
+        """Health check: browser answers a cheap CDP call"""
+        try:
+            self.driver.execute_cdp_cmd("Browser.getVersion", {})
+            return True
+        except Exception:
+            return False
+
+    def reset(self):
+        """Leave nothing from the previous report in the tab"""
+        self.driver.get("about:blank")
+        self.driver.delete_all_cookies()
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print(f"Error closing browser on port {self.debug_port}: {str(e)}")
+
+
+class BrowserPool:
+    """
+    Keeps up to size headless browsers running between reports.
+
+    A job leases a browser tab, prints and gives it back; the tab is reset to
+    about:blank. Browsers that fail the health check are replaced, and every
+    browser is restarted after max_jobs reports.
+    """
+
+    def __init__(self, size=BROWSER_POOL_SIZE, max_jobs=BROWSER_MAX_JOBS,
+                 driver_factory=create_chrome_driver):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.driver_factory = driver_factory
+        self._idle = []
+        self._started = 0        # idle + leased browsers
+        self._condition = threading.Condition()
+        self._closed = False
+        self._stats = {"jobs": 0, "started": 0, "recycled": 0, "unhealthy": 0}
+
+    def _start_browser(self):
+        debug_port = find_free_port()
+        browser = PooledBrowser(self.driver_factory(debug_port), debug_port)
+        with self._condition:
+            self._stats["started"] += 1
+        return browser
+
+    def _discard(self, browser):
+        browser.quit()
+        with self._condition:
+            self._started -= 1
+            self._condition.notify()
+
+    def _acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Browser pool is closed")
+                if self._idle:
+                    browser = self._idle.pop()
+                    break
+                if self._started < self.size:
+                    self._started += 1
+                    browser = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No free browser in pool after {timeout} s")
+                self._condition.wait(remaining)
+
+        # Starting and checking browsers is slow, so it happens outside the lock
+        if browser is not None:
+            if browser.is_alive():
+                return browser
+            with self._condition:
+                self._stats["unhealthy"] += 1
+            browser.quit()
+        try:
+            return self._start_browser()
+        except Exception:
+            with self._condition:
+                self._started -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, browser):
+        browser.jobs += 1
+        with self._condition:
+            self._stats["jobs"] += 1
+
+        if browser.jobs >= self.max_jobs:
+            with self._condition:
+                self._stats["recycled"] += 1
+            self._discard(browser)
+            return
+        try:
+            browser.reset()
+        except Exception as e:
+            print(f"Error resetting browser on port {browser.debug_port}: {str(e)}")
+            self._discard(browser)
+            return
+
+        with self._condition:
+            closed = self._closed
+            if not closed:
+                self._idle.append(browser)
+                self._condition.notify()
+        if closed:
+            self._discard(browser)
+
+    @contextmanager
+    def lease(self, timeout=LEASE_TIMEOUT):
+        """Context manager giving a ready WebDriver; it goes back to the pool on exit"""
+        browser = self._acquire(timeout)
+        try:
+            yield browser.driver
+        finally:
+            self._release(browser)
+
+    def warm_up(self):
+        """Start browsers up to pool size so the first reports skip the cold start"""
+        browsers = []
+        try:
+            while True:
+                with self._condition:
+                    if self._closed or self._started >= self.size:
+                        break
+                    self._started += 1
+                try:
+                    browsers.append(self._start_browser())
+                except Exception as e:
+                    print(f"Error starting browser: {str(e)}")
+                    with self._condition:
+                        self._started -= 1
+                    break
+        finally:
+            with self._condition:
+                self._idle.extend(browsers)
+                self._condition.notify_all()
+
+    def stats(self):
+        """Counters for monitoring: jobs, started, recycled, unhealthy, idle, running"""
+        with self._condition:
+            return {**self._stats, "idle": len(self._idle), "running": self._started}
+
+    def close(self):
+        """Quit idle browsers; leased ones are closed when they are returned"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._started -= len(idle)
+            self._condition.notify_all()
+        for browser in idle:
+            browser.quit()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_warm_up_thread = None
+
+
+def get_browser_pool():
+    """Shared browser pool for this process, closed at exit"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool()
+                atexit.register(_pool.close)
+    return _pool
+
+
+def warm_up_in_background():
+    """Start pool browsers in a daemon thread (once per process), returns immediately"""
+    global _warm_up_thread
+    # get_browser_pool takes _pool_lock itself, so the pool is created before the lock is held
+    pool = get_browser_pool()
+    with _pool_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=pool.warm_up, daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
@@ -0,0 +1,57 @@
+import socket
+import subprocess
+import time
+
+import requests
+
+# Lifecycle of Dash servers we start ourselves: everything goes through the
+# Popen handle and the port we gave the process, the process table is never scanned.
+
+
+def port_is_open(port, host="127.0.0.1", timeout=0.5):
+    """True if something accepts TCP connections on host:port"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def dash_app_alive(port, timeout=2):
+    """Cheap socket connect first, then Dash's /_alive endpoint"""
+    if not port_is_open(port):
+        return False
+    try:
+        return requests.get(f"http://localhost:{port}/_alive", timeout=timeout).status_code == 200
+    except requests.exceptions.RequestException:
+        return False
+
+
+def wait_for_dash_app(port, process, timeout=45, interval=0.2):
+    """
+    Wait until the Dash app started as process answers on port.
+
+    Returns False on timeout or as soon as the process has exited.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        if dash_app_alive(port):
+            return True
+        time.sleep(interval)
+    return False
+
+
+def stop_dash_process(process, timeout=5):
+    """Terminate the process (kill if it does not exit in timeout seconds)"""
+    if process is None or process.poll() is not None:
+        return
+    try:
+        process.terminate()
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    except OSError:
+        pass
@@ -9,6 +9,9 @@ from report_layouts.basic_layout import *
 from report_layouts.recomendation_layout import *
 from report_layouts import recomendation_layout
 from report_layouts import basic_layout
+from report_bundle import load_report_bundle
+from report_builder import create_report_layout, prepare_layout_args
+from ui_kit.static_html import StaticAssets, render_html_document
 import traceback
 import argparse
 import signal
@@ -31,104 +34,117 @@ signal.signal(signal.SIGINT, shutdown_handler)
 
 def get_layout(layout_type, **kwargs):
     """Factory function to return the appropriate layout based on type"""
-    if layout_type == 'basic':
-        basic_layout.app = app
-        # Удаляем ненужные аргументы для basic_layout
-        filtered_kwargs = {k: v for k, v in kwargs.items() 
-                         if k not in ['patient_message', 'doctor_message', 'patient_long_message']}
-        return basic_layout.create_layout(**filtered_kwargs)
-        
-    elif layout_type == 'recommendation':
-        recomendation_layout.app = app
-        return recomendation_layout.create_layout(**kwargs)
-        
-    else:
-        raise ValueError(f"Unknown layout type: {layout_type}")
+    return create_report_layout(layout_type, app, **kwargs)
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--name', required=True)
-    parser.add_argument('--age', required=True)
-    parser.add_argument('--gender', required=True)
-    parser.add_argument('--date', required=True)
-    parser.add_argument('--layout', required=True, choices=['basic', 'recommendation']),
-    parser.add_argument('--metabolomic_data', required=True)
-    parser.add_argument('--risk_scores', required=True)
-    parser.add_argument('--risk_params', required=True)
-    parser.add_argument('--ref_stats', required=True)
+    parser.add_argument('--bundle', help='Report bundle (report_bundle.py) with patient info and all tables')
+    parser.add_argument('--name')
+    parser.add_argument('--age')
+    parser.add_argument('--gender')
+    parser.add_argument('--date')
+    parser.add_argument('--layout', choices=['basic', 'recommendation']),
+    parser.add_argument('--metabolomic_data')
+    parser.add_argument('--risk_scores')
+    parser.add_argument('--risk_params')
+    parser.add_argument('--ref_stats')
     parser.add_argument('--patient_message', default="")
     parser.add_argument('--patient_long_message', default="")
     parser.add_argument('--doctor_message', default="")
-    parser.add_argument('--metrics', required=True)
+    parser.add_argument('--metrics')
+    parser.add_argument('--port', type=int, default=8050, help='Port for Dash server (pick a free one per report)')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--html', help='Write the report to a static HTML file instead of starting Dash server')
+    parser.add_argument('--inline_assets', action='store_true',
+                        help='With --html embed images into the page instead of file:// links')
+    parser.add_argument('--plot_format', choices=PLOT_FORMATS,
+                        help='Chart images: png (default) or svg; overrides plot_format from --bundle')
     args = parser.parse_args()
+
+    # Without a bundle every value comes from its own argument / xlsx file
+    if not args.bundle:
+        required = ['name', 'age', 'gender', 'date', 'layout', 'metabolomic_data',
+                    'risk_scores', 'risk_params', 'ref_stats', 'metrics']
+        missing = [f"--{arg}" for arg in required if getattr(args, arg) is None]
+        if missing:
+            parser.error(f"the following arguments are required without --bundle: {', '.join(missing)}")
+
     # Register shutdown handler
     signal.signal(signal.SIGTERM, shutdown_handler)
     
 
     try:
-        # Update global variables from command line args
-        name = args.name
-        age = args.age
-        gender = args.gender
-        date = args.date
-        patient_message = args.patient_message
-        patient_long_message = args.patient_long_message
-        doctor_messsage = args.doctor_message
-        metabolomic_data_path = args.metabolomic_data
-        risk_scores_path = args.risk_scores
-        risk_params_path = args.risk_params
-
-        # Process files with safety checks
-        metabolite_data = safe_parse_metabolite_data(metabolomic_data_path)
-
-        risk_scores = pd.read_excel(risk_scores_path)
-        ref_params = pd.read_excel(risk_params_path)
-        ref_stats = create_ref_stats_from_excel(args.ref_stats)
-        
-        metrics = pd.read_excel(args.metrics)
-        # Convert to the desired JSON structure
-        metrics_dict = {}
-        for _, row in metrics.iterrows():
-            metrics_dict[row['group_name']] = {
-                "Acc": f"{row['Acc']}%",
-                "Se": f"{row['Se']}%",
-                "Sp": f"{row['Sp']}%",
-                "+PV": f"{row['Pos_PV']}%",
-                "-PV": f"{row['Neg_PV']}%"
-            }
-
-        # Generate radial diagram
-        radial_path = os.path.join('assets', "radial_diagram.png")
-        generate_radial_diagram(risk_scores, radial_path)
-        footer_gen = page_footer_generator()
-
-        
-         # Prepare layout arguments
-        layout_args = {
-            'name': name,
-            'age': age,
-            'date': date,
-            'gender': gender,
-            'patient_message': patient_message,
-            'patient_long_message': patient_long_message,
-            'doctor_message': doctor_messsage,
-            'metrics_dict': metrics_dict,
-            'footer_gen': footer_gen,
-            'ref_stats': ref_stats,
-            'risk_scores': risk_scores,
-            'ref_params': ref_params,
-            'metabolite_data': metabolite_data
-        }
+        if args.bundle:
+            patient_info, tables = load_report_bundle(args.bundle)
+            layout_type = patient_info['layout']
+            name = patient_info['name']
+            age = patient_info['age']
+            gender = patient_info['gender']
+            date = patient_info['date']
+            patient_message = patient_info.get('patient_message', "")
+            patient_long_message = patient_info.get('patient_long_message', "")
+            doctor_messsage = patient_info.get('doctor_message', "")
+            plot_format = args.plot_format or patient_info.get('plot_format', 'png')
+
+            metabolite_data = metabolite_data_from_frame(tables['metabolomic_data'])
+            risk_scores = tables['risk_scores']
+            ref_params = tables['risk_params']
+            ref_stats = create_ref_stats_from_frame(tables['ref_stats'])
+            metrics = tables['metrics']
+        else:
+            # Update global variables from command line args
+            layout_type = args.layout
+            name = args.name
+            age = args.age
+            gender = args.gender
+            date = args.date
+            patient_message = args.patient_message
+            patient_long_message = args.patient_long_message
+            doctor_messsage = args.doctor_message
+            plot_format = args.plot_format or 'png'
+
+            # Process files with safety checks
+            metabolite_data = safe_parse_metabolite_data(args.metabolomic_data)
+
+            risk_scores = pd.read_excel(args.risk_scores)
+            ref_params = pd.read_excel(args.risk_params)
+            ref_stats = create_ref_stats_from_excel(args.ref_stats)
+            metrics = pd.read_excel(args.metrics)
+
+        # Prepare layout arguments
+        layout_args = prepare_layout_args(
+            name=name,
+            age=age,
+            gender=gender,
+            date=date,
+            metabolite_data=metabolite_data,
+            risk_scores=risk_scores,
+            ref_params=ref_params,
+            ref_stats=ref_stats,
+            metrics=metrics,
+            patient_message=patient_message,
+            patient_long_message=patient_long_message,
+            doctor_message=doctor_messsage,
+            plot_format=plot_format,
+        )
+
+        if args.html:
+            assets = StaticAssets(inline=args.inline_assets)
+            layout = create_report_layout(layout_type, assets, **layout_args)
+            with open(args.html, 'w', encoding='utf-8') as f:
+                f.write(render_html_document(layout, assets, title=f"Отчет {name}"))
+            print(f"Report written to {args.html}")
+            return
 
         # Get the appropriate layout
-        app.layout = get_layout(args.layout, **layout_args)
+        app.layout = get_layout(layout_type, **layout_args)
 
 
-        print("Starting Dash server...")
+        print(f"Starting Dash server on port {args.port}...")
         app.run(
             debug=False,
-            port=8050,
-            host='0.0.0.0',
+            port=args.port,
+            host=args.host,
             dev_tools_serve_dev_bundles=False,
         )
     
@@ -2,6 +2,8 @@ from models.base_pipeline import BaseDiseasePipeline
 import os
 import glob
 import joblib
+import pandas as pd
+import numpy as np
 
 class ONCOPipeline(BaseDiseasePipeline):
     DISEASE_NAME = "ONCO"
@@ -62,35 +64,36 @@ class ONCOPipeline(BaseDiseasePipeline):
             'liver': liver_model
         }
     
-    def calculate_risk(self, row):
+    def calculate_risk_batch(self, df):
         try:
-            # First stage - control model
+            # First stage - control model over all rows
             control_model = self.models['control']
-            X_control = self.preprocess_data(row, control_model.feature_names_in_)
-            control_proba = control_model.predict_proba(X_control)[0][0]
+            X_control = self.preprocess_data(df, control_model.feature_names_in_)
+            control_proba = control_model.predict_proba(X_control)[:, 0]
             
-            if control_proba < self.onco_threshold:
-                return {
-                    "Группа риска": "Оценка пролиферативных процессов",
-                    "Риск-скор": self.probability_to_score(control_proba, self.onco_threshold),
-                    "Метод оценки": "onco-control модель",
-                }
+            scores = self.probability_to_score(control_proba, self.onco_threshold)
+            methods = np.full(len(df), "onco-control модель", dtype=object)
             
-            # Second stage - liver model
-            liver_model = self.models['liver']
-            X_liver = self.preprocess_data(row, liver_model.feature_names_in_)
-            liver_proba = liver_model.predict_proba(X_liver)[0][0]
+            # Second stage - liver model only for rows that passed the threshold
+            liver_mask = control_proba >= self.onco_threshold
+            if liver_mask.any():
+                liver_model = self.models['liver']
+                X_liver = self.preprocess_data(df[liver_mask], liver_model.feature_names_in_)
+                liver_proba = liver_model.predict_proba(X_liver)[:, 0]
+                
+                scores[liver_mask] = self.probability_to_score(liver_proba, self.liver_threshold)
+                methods[liver_mask] = "onco-liver модель"
             
-            return {
+            return pd.DataFrame({
                 "Группа риска": "Оценка пролиферативных процессов",
-                "Риск-скор": self.probability_to_score(liver_proba, self.liver_threshold),
-                "Метод оценки": "onco-liver модель",
-            }
+                "Риск-скор": scores,
+                "Метод оценки": methods,
+            }, index=df.index)
             
         except Exception as e:
             print(f"Prediction error: {str(e)}")
-            return {
+            return pd.DataFrame({
                 "Группа риска": "Оценка пролиферативных процессов",
                 "Риск-скор": None,
                 "Метод оценки": f"ML модель (ошибка: {str(e)})",
-            }
\ No newline at end of file
+            }, index=df.index)
\ No newline at end of file
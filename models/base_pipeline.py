@@ -32,22 +32,38 @@ class BaseDiseasePipeline(ABC):
             key = os.path.basename(model_file)
             self.models[key] = joblib.load(model_file)
     
-    def preprocess_data(self, row, features):
-        """Предварительная обработка"""
-        X = pd.DataFrame([row[features]], columns=features)
-        X = X.replace([np.inf, -np.inf], np.nan).fillna(0).clip(-1e10, 1e10)
+    def preprocess_data(self, data, features):
+        """Предварительная обработка (одна строка или DataFrame с когортой)"""
+        if isinstance(data, pd.DataFrame):
+            X = data[list(features)]
+        else:
+            X = pd.DataFrame([data[features]], columns=features)
+        X = X.astype(np.float64).replace([np.inf, -np.inf], np.nan).fillna(0).clip(-1e10, 1e10)
         return X.astype(np.float32)
     
     @abstractmethod
-    def calculate_risk(self, row):
-        """Рассчитываем риски"""
+    def calculate_risk_batch(self, df):
+        """
+        Рассчитываем риски для всех строк df.
+        Возвращает DataFrame с колонками ['Группа риска', 'Риск-скор', 'Метод оценки']
+        и тем же индексом, что у df
+        """
         pass
     
+    def calculate_risk(self, row):
+        """Рассчитываем риски для одной строки"""
+        batch = self.calculate_risk_batch(row.to_frame().T)
+        return batch.iloc[0].to_dict()
+    
     @staticmethod
     def probability_to_score(prob, threshold):
-        prob = min(max(prob, 0), 1)
-        if prob < threshold:
-            score = 4 * prob / threshold
-        else:
-            score = 4 + 4 * (prob - threshold) / (1 - threshold)
-        return 10- round(score, 0)
\ No newline at end of file
+        """Переводим вероятность (число или массив) в скор 0-10"""
+        prob = np.clip(prob, 0, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            score = np.where(
+                prob < threshold,
+                4 * prob / threshold,
+                4 + 4 * (prob - threshold) / (1 - threshold),
+            )
+        score = 10 - np.round(score, 0)
+        return score if score.ndim else score.item()
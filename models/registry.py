@@ -0,0 +1,79 @@
+from importlib import import_module
+import threading
+import time
+
+# Пайплайны, доступные для расчета рисков (порядок важен для вывода)
+DISEASE_PIPELINES = {
+    "CVD": "CVD.pipeline.CVDPipeline",
+    "LIVER": "LIVER.pipeline.LIVERPipeline",
+    "PULMO": "PULMO.pipeline.PULMOPipeline",
+    "RA": "RA.pipeline.RAPipeline",
+    "ONCO": "ONCO.pipeline.ONCOPipeline",
+}
+
+_pipelines = {}
+_load_timings = {}
+_lock = threading.Lock()
+
+
+def _load_pipeline(disease_name):
+    """Import pipeline class and instantiate it (loads .pkl models from disk)"""
+    pipeline_path = DISEASE_PIPELINES[disease_name]
+    module_path, class_name = pipeline_path.rsplit('.', 1)
+    module = import_module(f"models.{module_path}")
+    pipeline_class = getattr(module, class_name)
+    return pipeline_class()
+
+
+def get_pipeline(disease_name):
+    """
+    Return shared pipeline instance for disease, loading it once per process.
+
+    Failed loads are not cached, so the next call retries.
+    """
+    pipeline = _pipelines.get(disease_name)
+    if pipeline is not None:
+        return pipeline
+
+    with _lock:
+        # Another thread may have loaded it while we were waiting
+        pipeline = _pipelines.get(disease_name)
+        if pipeline is None:
+            start = time.perf_counter()
+            pipeline = _load_pipeline(disease_name)
+            _load_timings[disease_name] = time.perf_counter() - start
+            _pipelines[disease_name] = pipeline
+    return pipeline
+
+
+def get_pipelines():
+    """Return {disease_name: pipeline} for all registered diseases"""
+    return {name: get_pipeline(name) for name in DISEASE_PIPELINES}
+
+
+def warm_up():
+    """
+    Load every registered pipeline so the first report does not pay for unpickling.
+
+    Returns {disease_name: error message} for pipelines that failed to load.
+    """
+    errors = {}
+    for disease_name in DISEASE_PIPELINES:
+        try:
+            get_pipeline(disease_name)
+        except Exception as e:
+            errors[disease_name] = str(e)
+            print(f"Error loading {disease_name} pipeline: {str(e)}")
+    return errors
+
+
+def get_load_timings():
+    """Return {disease_name: seconds spent loading} for loaded pipelines"""
+    return dict(_load_timings)
+
+
+def clear():
+    """Drop all cached pipelines (e.g. after model files were replaced)"""
+    with _lock:
+        _pipelines.clear()
+        _load_timings.clear()
@@ -0,0 +1,244 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+
+# Editable formula sheet (name, formula, output, section), lives next to Ref.xlsx
+RATIO_FORMULAS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ratio_formulas.csv")
+
+_TOKEN_RE = re.compile(r"\s*(?:\[([^\]]+)\]|(\d+(?:\.\d*)?)|([-+*/()]))")
+_OPERATIONS = {
+    '+': np.add,
+    '-': np.subtract,
+    '*': np.multiply,
+    '/': np.divide,
+}
+# a + b == b + a bit-for-bit in IEEE arithmetic, so these can be canonicalized
+_COMMUTATIVE = {'+', '*'}
+
+
+def _tokenize(formula):
+    tokens = []
+    pos = 0
+    formula = formula.strip()
+    while pos < len(formula):
+        match = _TOKEN_RE.match(formula, pos)
+        if not match:
+            raise ValueError(f"Cannot parse formula '{formula}' at position {pos}")
+        name, number, op = match.groups()
+        if name is not None:
+            tokens.append(('name', name.strip()))
+        elif number is not None:
+            tokens.append(('const', float(number)))
+        else:
+            tokens.append(('op', op))
+        pos = match.end()
+    return tokens
+
+
+def parse_formula(formula):
+    """
+    Parse formula like "([C2] + [C3]) / [C0]" into nested tuples:
+    ('name', 'C2'), ('const', 1.0) or (op, left, right)
+    """
+    tokens = _tokenize(formula)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else (None, None)
+
+    def factor():
+        nonlocal pos
+        kind, value = peek()
+        pos += 1
+        if kind in ('name', 'const'):
+            return (kind, value)
+        if (kind, value) == ('op', '('):
+            node = expr()
+            if peek() != ('op', ')'):
+                raise ValueError(f"Missing ')' in formula '{formula}'")
+            pos += 1
+            return node
+        raise ValueError(f"Unexpected token {value!r} in formula '{formula}'")
+
+    def binary(operand, ops):
+        nonlocal pos
+        node = operand()
+        while peek()[0] == 'op' and peek()[1] in ops:
+            op = peek()[1]
+            pos += 1
+            node = (op, node, operand())
+        return node
+
+    def term():
+        return binary(factor, '*/')
+
+    def expr():
+        return binary(term, '+-')
+
+    node = expr()
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected trailing tokens in formula '{formula}'")
+    return node
+
+
+def load_ratio_formulas(path=RATIO_FORMULAS_FILE):
+    """Read formula sheet (.csv or .xlsx) into DataFrame with name/formula/output/section"""
+    if str(path).endswith(('.xlsx', '.xls')):
+        formulas = pd.read_excel(path)
+    else:
+        formulas = pd.read_csv(path, encoding='utf-8-sig')
+
+    formulas = formulas.dropna(subset=['name', 'formula'])
+    formulas['name'] = formulas['name'].astype(str).str.strip()
+    if 'output' not in formulas.columns:
+        formulas['output'] = 1
+    formulas['output'] = formulas['output'].fillna(1).astype(int).astype(bool)
+
+    duplicated = formulas['name'][formulas['name'].duplicated()]
+    if not duplicated.empty:
+        raise ValueError(f"Duplicated formula names: {', '.join(duplicated)}")
+    return formulas.reset_index(drop=True)
+
+
+class RatioPlan:
+    """
+    Compiled formula set: every distinct subexpression is evaluated once,
+    in dependency order, on a (rows x inputs) float matrix.
+    """
+
+    def __init__(self, inputs, steps, outputs, aliases):
+        self.inputs = inputs      # input column names, slot i == column i
+        self.steps = steps        # [(op, left_slot, right_slot) or ('const', value)]
+        self.outputs = outputs    # {output name: slot}
+        self.aliases = aliases    # {output name: output name with identical expression}
+
+    def __repr__(self):
+        return (
+            f"RatioPlan(inputs={len(self.inputs)}, steps={len(self.steps)}, "
+            f"outputs={len(self.outputs)}, aliases={len(self.aliases)})"
+        )
+
+    def evaluate(self, data):
+        """Evaluate all outputs for DataFrame data, returns {name: ndarray}"""
+        missing = [col for col in self.inputs if col not in data.columns]
+        if missing:
+            raise KeyError(f"Missing columns for ratio formulas: {missing}")
+
+        matrix = data[self.inputs].to_numpy(dtype=np.float64)
+        slots = [matrix[:, i] for i in range(len(self.inputs))]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for step in self.steps:
+                if step[0] == 'const':
+                    slots.append(np.full(len(matrix), step[1]))
+                else:
+                    op, left, right = step
+                    slots.append(_OPERATIONS[op](slots[left], slots[right]))
+
+        return {name: slots[slot] for name, slot in self.outputs.items()}
+
+    def unused_outputs(self, used_names):
+        """Output names not present in used_names (e.g. Params_metaboscan markers)"""
+        used_names = set(used_names)
+        return [name for name in self.outputs if name not in used_names]
+
+
+def compile_ratio_plan(formulas, only=None):
+    """
+    Compile formulas DataFrame into RatioPlan.
+
+    Names in [brackets] refer to other formulas first, then to data columns.
+    Structurally identical subexpressions share one step. If only is given,
+    just those outputs (and what they depend on) are compiled.
+    """
+    definitions = dict(zip(formulas['name'], formulas['formula']))
+    output_names = [
+        name for name, is_output in zip(formulas['name'], formulas['output']) if is_output
+    ]
+    if only is not None:
+        only = set(only)
+        output_names = [name for name in output_names if name in only]
+
+    inputs = []
+    input_slots = {}
+    steps = []
+    step_slots = {}      # canonical key -> slot
+    resolved = {}        # formula name -> (slot, key)
+    resolving = set()
+
+    def build(node):
+        kind = node[0]
+        if kind == 'name':
+            name = node[1]
+            if name in definitions:
+                return resolve(name)
+            if name not in input_slots:
+                input_slots[name] = len(inputs)
+                inputs.append(name)
+            return ('input', name), ('name', name)
+        if kind == 'const':
+            key = ('const', node[1])
+            if key not in step_slots:
+                step_slots[key] = ('step', len(steps))
+                steps.append(key)
+            return step_slots[key], key
+
+        op, left, right = node
+        left_slot, left_key = build(left)
+        right_slot, right_key = build(right)
+        if op in _COMMUTATIVE and repr(right_key) < repr(left_key):
+            left_slot, left_key, right_slot, right_key = right_slot, right_key, left_slot, left_key
+        key = (op, left_key, right_key)
+        if key not in step_slots:
+            step_slots[key] = ('step', len(steps))
+            steps.append((op, left_slot, right_slot))
+        return step_slots[key], key
+
+    def resolve(name):
+        if name in resolved:
+            return resolved[name]
+        if name in resolving:
+            raise ValueError(f"Circular reference in ratio formula '{name}'")
+        resolving.add(name)
+        resolved[name] = build(parse_formula(definitions[name]))
+        resolving.discard(name)
+        return resolved[name]
+
+    targets = {name: resolve(name) for name in output_names}
+
+    # Inputs come first in the slot list, so step slots are shifted once all are known
+    n_inputs = len(inputs)
+
+    def to_index(slot):
+        kind, value = slot
+        return input_slots[value] if kind == 'input' else n_inputs + value
+
+    final_steps = [
+        step if step[0] == 'const' else (step[0], to_index(step[1]), to_index(step[2]))
+        for step in steps
+    ]
+
+    outputs = {}
+    aliases = {}
+    first_by_key = {}
+    for name, (slot, key) in targets.items():
+        outputs[name] = to_index(slot)
+        if key in first_by_key:
+            aliases[name] = first_by_key[key]
+        else:
+            first_by_key[key] = name
+
+    return RatioPlan(inputs, final_steps, outputs, aliases)
+
+
+_plan_cache = {}
+
+
+def get_ratio_plan(path=RATIO_FORMULAS_FILE):
+    """Compiled plan for formula sheet, recompiled only when the file changes"""
+    mtime = os.path.getmtime(path)
+    cached = _plan_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, compile_ratio_plan(load_ratio_formulas(path)))
+        _plan_cache[path] = cached
+    return cached[1]
@@ -0,0 +1,217 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from risk_scoring import ref_stats_table_from_frame
+from ui_kit.dash_utilit import create_ref_stats_from_frame
+
+# Versions of the edited reference kept per session
+MAX_VERSIONS = 20
+# Derived structures (numeric tables, dicts) kept per sheet hash, for all sessions
+DERIVED_CACHE_SIZE = 64
+
+# Parquet schema metadata key: columns that mix numbers and text (Ref_stats keeps
+# names under the numbers) are stored as text and parsed back cell by cell
+_MIXED_COLUMNS_KEY = b'metaboscan.mixed_columns'
+
+
+def _is_mixed(values):
+    return values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'empty')
+
+
+def _cell_to_text(value):
+    return None if pd.isna(value) else str(value)
+
+
+def _cell_from_text(text):
+    if text is None:
+        return None
+    for parse in (int, float):
+        try:
+            return parse(text)
+        except ValueError:
+            pass
+    return text
+
+
+def frame_to_snapshot(df):
+    """DataFrame -> Parquet bytes (index included); same contents give the same bytes"""
+    mixed = [col for col in df.columns if _is_mixed(df[col])]
+    if mixed:
+        df = df.assign(**{col: df[col].map(_cell_to_text) for col in mixed})
+
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    metadata = dict(table.schema.metadata or {})
+    metadata[_MIXED_COLUMNS_KEY] = '\n'.join(mixed).encode('utf-8')
+    table = table.replace_schema_metadata(metadata)
+
+    buf = BytesIO()
+    pq.write_table(table, buf)
+    return buf.getvalue()
+
+
+def frame_from_snapshot(data):
+    """Inverse of frame_to_snapshot"""
+    table = pq.read_table(BytesIO(data))
+    mixed = (table.schema.metadata or {}).get(_MIXED_COLUMNS_KEY, b'').decode('utf-8')
+    df = table.to_pandas()
+    for col in filter(None, mixed.split('\n')):
+        df[col] = df[col].map(_cell_from_text).astype(object)
+    return df
+
+
+def diff_frames(original, edited):
+    """
+    Small description of edits: added / removed rows and columns (labels)
+    and changed cells as (row, column, old, new), only for rows and columns in both
+    """
+    common_rows = original.index.intersection(edited.index)
+    common_cols = original.columns.intersection(edited.columns)
+    before = original.loc[common_rows, common_cols]
+    after = edited.loc[common_rows, common_cols]
+
+    changed = (~((before == after) | (before.isna() & after.isna()))).stack(future_stack=True)
+    cells = [
+        (row, col, before.at[row, col], after.at[row, col])
+        for row, col in changed[changed].index
+    ]
+    return {
+        'rows_added': edited.index.difference(original.index).tolist(),
+        'rows_removed': original.index.difference(edited.index).tolist(),
+        'columns_added': edited.columns.difference(original.columns).tolist(),
+        'columns_removed': original.columns.difference(edited.columns).tolist(),
+        'cells': cells,
+    }
+
+
+def diff_is_empty(diff):
+    return not any(diff.values())
+
+
+class SheetSnapshot:
+    """
+    One sheet in one version.
+
+    hash - content hash (for a sheet equal to the workbook: derived from the workbook hash)
+    data - Parquet bytes, None when the sheet is unchanged against the workbook
+    diff - diff_frames against the workbook sheet
+    """
+
+    __slots__ = ('name', 'hash', 'data', 'diff')
+
+    def __init__(self, name, hash, data, diff):
+        self.name = name
+        self.hash = hash
+        self.data = data
+        self.diff = diff
+
+
+class RefSnapshots:
+    """Versioned snapshots of the reference sheets edited in one Streamlit session"""
+
+    def __init__(self, store):
+        self.store = store           # reference_store.ReferenceStore with the pristine sheets
+        self.versions = []           # [{'version', 'created', 'sheets': {name: SheetSnapshot}}]
+        self._frames = {}            # name -> frame committed last, to skip unchanged sheets cheaply
+
+    def _original_snapshot(self, name):
+        empty = {'rows_added': [], 'rows_removed': [], 'columns_added': [], 'columns_removed': [], 'cells': []}
+        return SheetSnapshot(name, f"{self.store.fingerprint}/{name}", None, empty)
+
+    def _snapshot(self, name, df):
+        current = self.versions[-1]['sheets'] if self.versions else {}
+        if name in current and name in self._frames and df.equals(self._frames[name]):
+            return current[name]
+
+        original = self.store.sheets.get(name)
+        if original is not None and df.equals(original):
+            return self._original_snapshot(name)
+
+        data = frame_to_snapshot(df)
+        diff = diff_frames(original, df) if original is not None else None
+        return SheetSnapshot(name, hashlib.sha256(data).hexdigest(), data, diff)
+
+    def commit(self, sheets):
+        """
+        Snapshot the edited sheets ({name: DataFrame}); returns the current version.
+        Nothing is serialized for sheets unchanged since the last commit or against the workbook,
+        and no new version is made if no hash changed.
+        """
+        snapshots = {name: self._snapshot(name, df) for name, df in sheets.items()}
+        # Copies: a frame changed in place later must not look unchanged
+        self._frames = {name: df.copy() for name, df in sheets.items()}
+
+        if self.versions:
+            last = self.versions[-1]
+            if {n: s.hash for n, s in last['sheets'].items()} == {n: s.hash for n, s in snapshots.items()}:
+                return last
+
+        version = {
+            'version': self.versions[-1]['version'] + 1 if self.versions else 1,
+            'created': time.time(),
+            'sheets': snapshots,
+        }
+        self.versions.append(version)
+        del self.versions[:-MAX_VERSIONS]
+        return version
+
+    def current(self):
+        return self.versions[-1] if self.versions else None
+
+    def sheet_frame(self, version, name):
+        """DataFrame of the sheet as it was in version"""
+        snapshot = version['sheets'][name]
+        if snapshot.data is None:
+            return self.store.sheets[name].copy()
+        return frame_from_snapshot(snapshot.data)
+
+    def restore(self, version_number):
+        """{name: DataFrame} of an earlier version, e.g. to put it back into the editor"""
+        for version in self.versions:
+            if version['version'] == version_number:
+                return {name: self.sheet_frame(version, name) for name in version['sheets']}
+        raise KeyError(f"No reference version {version_number}")
+
+
+_derived = OrderedDict()     # (kind, sheet hash) -> value
+_derived_lock = threading.Lock()
+
+
+def memoized(kind, sheet_hash, build):
+    """build() once per (kind, sheet hash), least recently used entries are dropped"""
+    key = (kind, sheet_hash)
+    with _derived_lock:
+        if key in _derived:
+            _derived.move_to_end(key)
+            return _derived[key]
+
+    value = build()
+    with _derived_lock:
+        _derived[key] = value
+        while len(_derived) > DERIVED_CACHE_SIZE:
+            _derived.popitem(last=False)
+    return value
+
+
+def snapshot_ref_stats_table(snapshots, version):
+    """Numeric Ref_stats table (risk_scoring format) of the version"""
+    snapshot = version['sheets']['Ref_stats']
+    if snapshot.data is None:
+        return snapshots.store.ref_stats_table
+    return memoized('ref_stats_table', snapshot.hash,
+                    lambda: ref_stats_table_from_frame(frame_from_snapshot(snapshot.data)))
+
+
+def snapshot_ref_stats(snapshots, version):
+    """{metabolite: {...}} view of the version's Ref_stats used by the report layouts"""
+    snapshot = version['sheets']['Ref_stats']
+    if snapshot.data is None:
+        return snapshots.store.ref_stats
+    return memoized('ref_stats', snapshot.hash,
+                    lambda: create_ref_stats_from_frame(frame_from_snapshot(snapshot.data)))
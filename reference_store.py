@@ -0,0 +1,146 @@
+import hashlib
+import os
+import threading
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from risk_scoring import ref_stats_table_from_frame
+from ui_kit.dash_utilit import RefStatsArrays
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+REF_FILE = os.path.join(base_dir, 'Ref.xlsx')
+
+# Листы и колонки, без которых расчет и отчет невозможны
+REQUIRED_SHEETS = ('Params_metaboscan', 'Ref_stats', 'metrics_ml_models')
+PARAMS_COLUMNS = ('Категория', 'Группа_риска', 'Маркер / Соотношение', 'веса')
+METRICS_COLUMNS = ('group_name', 'Acc', 'Se', 'Sp', 'Pos_PV', 'Neg_PV')
+REQUIRED_STATS = ('mean', 'sd')
+NUMERIC_STATS = ('mean', 'sd', 'ref_min', 'ref_max')
+
+
+def validate_reference(sheets):
+    """
+    Check Ref.xlsx sheets ({sheet name: DataFrame}, as edited in Streamlit too).
+
+    Returns list of problems, empty if the reference can be used.
+    """
+    problems = [f"Required sheet '{name}' not found in reference file"
+                for name in REQUIRED_SHEETS if name not in sheets]
+    if problems:
+        return problems
+
+    params = sheets['Params_metaboscan']
+    missing = [col for col in PARAMS_COLUMNS if col not in params.columns]
+    if missing:
+        problems.append(f"Params_metaboscan: missing columns {', '.join(missing)}")
+    elif pd.to_numeric(params['веса'], errors='coerce').isna().any():
+        problems.append("Params_metaboscan: non-numeric weights (веса)")
+
+    metrics = sheets['metrics_ml_models']
+    missing = [col for col in METRICS_COLUMNS if col not in metrics.columns]
+    if missing:
+        problems.append(f"metrics_ml_models: missing columns {', '.join(missing)}")
+
+    ref_sheet = sheets['Ref_stats']
+    if ref_sheet.empty or ref_sheet.columns[0] != 'metabolite':
+        problems.append("Ref_stats: first column must be 'metabolite'")
+        return problems
+
+    table = ref_stats_table_from_frame(ref_sheet)
+    missing = [stat for stat in REQUIRED_STATS if stat not in table.index]
+    if missing:
+        problems.append(f"Ref_stats: missing rows {', '.join(missing)}")
+        return problems
+
+    duplicated = table.columns[table.columns.duplicated()].unique().tolist()
+    if duplicated:
+        problems.append(f"Ref_stats: duplicated metabolites {', '.join(map(str, duplicated))}")
+
+    bad_sd = table.columns[~(table.loc['sd'] > 0)].tolist()
+    if bad_sd:
+        problems.append(f"Ref_stats: sd must be a positive number for {', '.join(map(str, bad_sd))}")
+
+    if 'Маркер / Соотношение' in params.columns:
+        no_reference = sorted(set(params['Маркер / Соотношение'].dropna()) - set(table.columns))
+        if no_reference:
+            problems.append(f"Params_metaboscan: no Ref_stats entry for {', '.join(map(str, no_reference))}")
+
+    return problems
+
+
+class ReferenceStore:
+    """
+    Parsed and validated Ref.xlsx.
+
+    sheets          - {sheet name: DataFrame} as read from the workbook (do not modify, use sheet_copies)
+    ref_stats_table - numeric Ref_stats, rows are stats, columns are metabolites (risk_scoring format)
+    metabolites     - Index of metabolites, order of the arrays in stats
+    stats           - {'mean' / 'sd' / 'ref_min' / 'ref_max': float64 array}, NaN where not set
+    ref_arrays      - RefStatsArrays: Ref_stats parsed column-wise (bounds, norm strings, precision)
+    ref_stats       - {metabolite: {...}} view used by the report layouts
+    fingerprint     - sha256 of the workbook contents
+    """
+
+    def __init__(self, sheets, fingerprint, path=None):
+        problems = validate_reference(sheets)
+        if problems:
+            raise ValueError("Invalid reference file: " + "; ".join(problems))
+
+        self.path = path
+        self.fingerprint = fingerprint
+        self.sheets = sheets
+        self.ref_stats_table = ref_stats_table_from_frame(sheets['Ref_stats'])
+        self.metabolites = self.ref_stats_table.columns
+        self.stats = {
+            stat: self.ref_stats_table.loc[stat].to_numpy(dtype=np.float64)
+            for stat in NUMERIC_STATS if stat in self.ref_stats_table.index
+        }
+        self.ref_arrays = RefStatsArrays(sheets['Ref_stats'])
+        self.ref_stats = self.ref_arrays.entries()
+
+    def aligned(self, metabolites, stats=REQUIRED_STATS):
+        """Arrays of the given stats aligned with metabolites, NaN for unknown metabolites"""
+        positions = self.metabolites.get_indexer(pd.Index(metabolites))
+        found = positions >= 0
+        result = []
+        for stat in stats:
+            values = np.full(len(positions), np.nan)
+            values[found] = self.stats[stat][positions[found]]
+            result.append(values)
+        return tuple(result)
+
+    def sheet_copies(self):
+        """Independent copies of every sheet, e.g. for editing"""
+        return {name: df.copy() for name, df in self.sheets.items()}
+
+
+_stores = {}                 # path -> (mtime_ns, size, ReferenceStore)
+_stores_lock = threading.Lock()
+
+
+def load_reference_store(path=REF_FILE):
+    """
+    ReferenceStore for the workbook at path, parsed once per process.
+
+    File mtime and size are checked on every call; if they changed, the contents
+    are hashed and the workbook is parsed again only if the hash differs.
+    """
+    path = os.path.abspath(path)
+    with _stores_lock:
+        stat = os.stat(path)
+        cached = _stores.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        with open(path, 'rb') as f:
+            content = f.read()
+        fingerprint = hashlib.sha256(content).hexdigest()
+
+        if cached and cached[2].fingerprint == fingerprint:
+            store = cached[2]  # touched, but not changed
+        else:
+            store = ReferenceStore(pd.read_excel(BytesIO(content), sheet_name=None), fingerprint, path)
+        _stores[path] = (stat.st_mtime_ns, stat.st_size, store)
+        return store
@@ -0,0 +1,137 @@
+import threading
+
+from ui_kit import render_functions
+from ui_kit.render_functions import (batch_metabolite_rows, collect_coridor_plots, page_footer_generator,
+                                     render_collected_coridor_plots)
+from ui_kit.dash_utilit import PLOT_FORMATS, create_ref_stats_from_frame, metabolite_data_from_frame
+from ui_kit.static_html import StaticAssets, render_html_document
+from report_layouts import basic_layout, recomendation_layout
+from report_bundle import normalize_report_table
+
+# Layout modules and render_functions keep the asset resolver and plot format
+# in module globals, so renders within one process go one at a time.
+# Chart images are data URIs inside the layout, separate processes never share them.
+_render_lock = threading.RLock()
+
+
+def metrics_to_dict(metrics):
+    """Metrics table -> {group_name: {"Acc": "..%", ...}} used by score cards"""
+    metrics_dict = {}
+    for _, row in metrics.iterrows():
+        metrics_dict[row['group_name']] = {
+            "Acc": f"{row['Acc']}%",
+            "Se": f"{row['Se']}%",
+            "Sp": f"{row['Sp']}%",
+            "+PV": f"{row['Pos_PV']}%",
+            "-PV": f"{row['Neg_PV']}%"
+        }
+    return metrics_dict
+
+
+def prepare_layout_args(name, age, gender, date, metabolite_data, risk_scores, ref_params,
+                        ref_stats, metrics, patient_message="", patient_long_message="",
+                        doctor_message="", plot_format='png'):
+    """
+    Build create_layout arguments.
+
+    plot_format ('png' or 'svg') applies to every chart of the report.
+    """
+    if plot_format not in PLOT_FORMATS:
+        raise ValueError(f"Unknown plot format: {plot_format}")
+
+    return {
+        'name': name,
+        'age': age,
+        'date': date,
+        'gender': gender,
+        'patient_message': patient_message,
+        'patient_long_message': patient_long_message,
+        'doctor_message': doctor_message,
+        'metrics_dict': metrics_to_dict(metrics),
+        'footer_gen': page_footer_generator(),
+        'ref_stats': ref_stats,
+        'risk_scores': risk_scores,
+        'ref_params': ref_params,
+        'metabolite_data': metabolite_data,
+        'plot_format': plot_format,
+    }
+
+
+def layout_args_from_bundle(patient_info, tables, ref_stats=None):
+    """
+    prepare_layout_args for data loaded with report_bundle.load_report_bundle,
+    or for the same tables straight from memory (normalized here the same way).
+    ref_stats: ready {metabolite: {...}} dict for tables['ref_stats'], if the caller has one.
+    """
+    tables = {name: normalize_report_table(df) for name, df in tables.items()}
+    if ref_stats is None:
+        ref_stats = create_ref_stats_from_frame(tables['ref_stats'])
+    return prepare_layout_args(
+        name=patient_info['name'],
+        age=patient_info['age'],
+        gender=patient_info['gender'],
+        date=patient_info['date'],
+        metabolite_data=metabolite_data_from_frame(tables['metabolomic_data']),
+        risk_scores=tables['risk_scores'],
+        ref_params=tables['risk_params'],
+        ref_stats=ref_stats,
+        metrics=tables['metrics'],
+        patient_message=patient_info.get('patient_message', ""),
+        patient_long_message=patient_info.get('patient_long_message', ""),
+        doctor_message=patient_info.get('doctor_message', ""),
+        plot_format=patient_info.get('plot_format', 'png'),
+    )
+
+
+def create_report_layout(layout_type, app, **kwargs):
+    """
+    Factory function to return the appropriate layout based on type.
+
+    app is anything with get_asset_url: Dash app or ui_kit.static_html.StaticAssets.
+    Corridor plots are collected while the tree is built and drawn afterwards in one batch;
+    metabolite rows are classified in one pass before it.
+    """
+    render_functions.app = app
+    render_functions.plot_format = kwargs.pop('plot_format', 'png')
+    with collect_coridor_plots() as coridor_plots, \
+            batch_metabolite_rows(kwargs['metabolite_data'], kwargs['ref_stats']):
+        if layout_type == 'basic':
+            basic_layout.app = app
+            # Удаляем ненужные аргументы для basic_layout
+            filtered_kwargs = {k: v for k, v in kwargs.items()
+                               if k not in ['patient_message', 'doctor_message', 'patient_long_message']}
+            layout = basic_layout.create_layout(**filtered_kwargs)
+
+        elif layout_type == 'recommendation':
+            recomendation_layout.app = app
+            layout = recomendation_layout.create_layout(**kwargs)
+
+        else:
+            raise ValueError(f"Unknown layout type: {layout_type}")
+
+    render_collected_coridor_plots(coridor_plots)
+    return layout
+
+
+def build_report_layout(patient_info, tables, app, ref_stats=None):
+    """Layout component tree for a report bundle, assets resolved through app"""
+    with _render_lock:
+        layout_args = layout_args_from_bundle(patient_info, tables, ref_stats)
+        return create_report_layout(patient_info['layout'], app, **layout_args)
+
+
+def render_report_html(patient_info, tables, output_path, inline_assets=False, ref_stats=None):
+    """
+    Render report straight to a static HTML file, without a Dash server.
+
+    With inline_assets images (and plotly.js) are embedded as data URIs,
+    otherwise they are referenced by file:// URL, which is enough for a local Chromium.
+    """
+    assets = StaticAssets(inline=inline_assets)
+    with _render_lock:
+        layout = build_report_layout(patient_info, tables, assets, ref_stats)
+        document = render_html_document(layout, assets, title=f"Отчет {patient_info['name']}")
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(document)
+    return output_path
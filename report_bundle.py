@@ -0,0 +1,88 @@
+import json
+import pandas as pd
+
+# Таблицы, которые Streamlit передает в генератор отчета
+BUNDLE_TABLES = ('risk_scores', 'risk_params', 'metabolomic_data', 'ref_stats', 'metrics')
+BUNDLE_VERSION = 1
+
+# JSON keeps mixed-type sheets (Ref_stats mixes numbers and names) as they are,
+# and Python writes floats with repr(), so values survive the round trip.
+# NaN/Infinity are written as JS literals, which json.load reads back.
+
+
+def _frame_to_dict(df):
+    return df.to_dict(orient='split')
+
+
+def normalize_report_table(df):
+    """
+    Table as the layouts expect it, whether it came from a bundle or straight from memory.
+
+    Layouts were written against tables read back from xlsx, where whole-number
+    float columns come back as int64 (e.g. "7 из 10", not "7.0 из 10").
+    Returns a new DataFrame if anything changed, the input is not modified.
+    """
+    whole = {}
+    for col in df.select_dtypes(include='float').columns:
+        values = df[col]
+        if values.notna().all() and (values % 1 == 0).all():
+            whole[col] = values.astype('int64')
+    if not whole:
+        return df
+    df = df.copy()
+    for col, values in whole.items():
+        df[col] = values
+    return df
+
+
+def _frame_from_dict(data):
+    return normalize_report_table(pd.DataFrame(data['data'], columns=data['columns'], index=data['index']))
+
+
+def report_bundle_to_dict(patient_info, tables):
+    """
+    JSON-ready bundle with everything the report renderer needs.
+
+    :param patient_info: dict with name, age, gender, date, layout and optional messages
+    :param tables: dict {table name: DataFrame}, keys from BUNDLE_TABLES
+    :return: dict
+    """
+    missing = [name for name in BUNDLE_TABLES if name not in tables]
+    if missing:
+        raise ValueError(f"Report bundle is missing tables: {', '.join(missing)}")
+
+    return {
+        'version': BUNDLE_VERSION,
+        'patient_info': patient_info,
+        'tables': {name: _frame_to_dict(tables[name]) for name in BUNDLE_TABLES},
+    }
+
+
+def report_bundle_from_dict(bundle):
+    """Inverse of report_bundle_to_dict, returns (patient_info, {table name: DataFrame})"""
+    if bundle.get('version') != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported report bundle version: {bundle.get('version')}")
+
+    tables = {name: _frame_from_dict(data) for name, data in bundle['tables'].items()}
+    return bundle['patient_info'], tables
+
+
+def save_report_bundle(path, patient_info, tables):
+    """
+    Write everything the report renderer needs into one JSON file.
+
+    :param path: output file path
+    :param patient_info: dict with name, age, gender, date, layout and optional messages
+    :param tables: dict {table name: DataFrame}, keys from BUNDLE_TABLES
+    :return: path
+    """
+    bundle = report_bundle_to_dict(patient_info, tables)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(bundle, f, ensure_ascii=False, default=str)
+    return path
+
+
+def load_report_bundle(path):
+    """Read bundle written by save_report_bundle, returns (patient_info, {table name: DataFrame})"""
+    with open(path, encoding='utf-8') as f:
+        return report_bundle_from_dict(json.load(f))
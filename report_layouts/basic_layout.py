@@ -28,7 +28,7 @@ def create_layout(name, age, gender, date, metrics_dict, footer_gen, ref_stats,
                         },
                     ),
                     html.Img(
-                        src=app.get_asset_url('radial_diagram.png'),
+                        src=radial_diagram_src(risk_scores),
                         style={
                             'height': '350px',
                             'width': 'auto',  # This maintains aspect ratio
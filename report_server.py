@@ -0,0 +1,195 @@
+import argparse
+import atexit
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import flask
+import requests
+from dash import Dash, Input, Output, dcc, html
+
+from browser_pool import find_free_port
+from dash_process import stop_dash_process, wait_for_dash_app
+from report_builder import build_report_layout
+from report_bundle import report_bundle_from_dict, report_bundle_to_dict
+from ui_kit.plot_pool import warm_up_plot_workers
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+SERVER_LOG = os.path.join(base_dir, 'report_server.log')
+
+REPORT_TTL = 600             # seconds a report stays available if nobody expires it
+SERVER_START_TIMEOUT = 60    # seconds to wait for the server to come up
+
+
+# ---------------------------------------------------------------------------
+# Server side: one resident Dash app, every report lives at /report/<job_id>
+# ---------------------------------------------------------------------------
+
+_reports = {}                # job_id -> (registered at, layout)
+_reports_lock = threading.Lock()
+
+
+def _expire_stale(now):
+    for job_id in [job_id for job_id, (registered, _) in _reports.items()
+                   if now - registered > REPORT_TTL]:
+        del _reports[job_id]
+
+
+def register_report(app, patient_info, tables):
+    """Build layout for the report and publish it, returns job_id"""
+    layout = build_report_layout(patient_info, tables, app)
+    job_id = uuid.uuid4().hex
+    with _reports_lock:
+        now = time.time()
+        _expire_stale(now)
+        _reports[job_id] = (now, layout)
+    return job_id
+
+
+def expire_report(job_id):
+    """Forget the report (after it was printed); returns False if it was not there"""
+    with _reports_lock:
+        return _reports.pop(job_id, None) is not None
+
+
+def get_report_layout(job_id):
+    with _reports_lock:
+        _expire_stale(time.time())
+        report = _reports.get(job_id)
+    return report[1] if report else None
+
+
+def create_report_app():
+    """Dash app serving registered reports plus a small JSON API to add / expire them"""
+    app = Dash(__name__, suppress_callback_exceptions=True, update_title=None)
+
+    # Report content comes from a callback, report_ready.js waits until it is filled
+    app.layout = html.Div([
+        dcc.Location(id='report-url'),
+        html.Div(id='report-content'),
+    ])
+
+    @app.callback(Output('report-content', 'children'), Input('report-url', 'pathname'))
+    def show_report(pathname):
+        job_id = (pathname or '').rstrip('/').rsplit('/', 1)[-1]
+        layout = get_report_layout(job_id) if (pathname or '').startswith('/report/') else None
+        if layout is None:
+            return html.Div(f"Report not found or expired: {pathname}", id='report-missing')
+        return layout
+
+    @app.server.route('/api/reports', methods=['POST'])
+    def create_report():
+        try:
+            patient_info, tables = report_bundle_from_dict(json.loads(flask.request.get_data()))
+            job_id = register_report(app, patient_info, tables)
+        except Exception as e:
+            print(f"DASH_APP_ERROR:{type(e).__name__}:{str(e)}", file=sys.stderr)
+            return flask.jsonify({'error': f"{type(e).__name__}: {str(e)}"}), 400
+        return flask.jsonify({'job_id': job_id, 'path': f"/report/{job_id}"})
+
+    @app.server.route('/api/reports/<job_id>', methods=['DELETE'])
+    def delete_report(job_id):
+        return flask.jsonify({'expired': expire_report(job_id)})
+
+    return app
+
+
+def preload():
+    """Pay the one-time costs (font lookup, matplotlib caches, plot workers) before the first report"""
+    from matplotlib import font_manager
+    font_manager.findfont('Calibri')
+    warm_up_plot_workers()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--host', default='127.0.0.1')
+    args = parser.parse_args()
+
+    app = create_report_app()
+    preload()
+    print(f"Starting report server on port {args.port}...")
+    app.run(debug=False, port=args.port, host=args.host, dev_tools_serve_dev_bundles=False)
+
+
+# ---------------------------------------------------------------------------
+# Client side: used from Streamlit to start the server once and submit reports
+# ---------------------------------------------------------------------------
+
+_server = None               # (Popen, port)
+_server_lock = threading.Lock()
+
+
+def _start_server():
+    port = find_free_port()
+    log = open(SERVER_LOG, 'a')
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(base_dir, 'report_server.py'), '--port', str(port)],
+        cwd=base_dir,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    log.close()
+
+    if wait_for_dash_app(port, process, timeout=SERVER_START_TIMEOUT):
+        return process, port
+    if process.poll() is not None:
+        raise RuntimeError(f"Report server exited with code {process.returncode}, see {SERVER_LOG}")
+    stop_dash_process(process)
+    raise RuntimeError(f"Report server did not start in {SERVER_START_TIMEOUT} s")
+
+
+def get_report_server_url():
+    """Base URL of the resident report server, (re)started if it is not running"""
+    global _server
+    with _server_lock:
+        if _server is None or _server[0].poll() is not None:
+            _server = _start_server()
+        return f"http://localhost:{_server[1]}"
+
+
+def submit_report(patient_info, tables, timeout=120):
+    """Register report on the server, returns (job_id, page URL)"""
+    base_url = get_report_server_url()
+    payload = json.dumps(report_bundle_to_dict(patient_info, tables), ensure_ascii=False, default=str)
+    response = requests.post(
+        f"{base_url}/api/reports",
+        data=payload.encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        timeout=timeout,
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Report server error ({response.status_code}): {response.text[:500]}")
+    result = response.json()
+    return result['job_id'], base_url + result['path']
+
+
+def release_report(job_id):
+    """Expire the report page once it has been printed"""
+    server = _server
+    if server is None or server[0].poll() is not None:
+        return  # server is gone, and its reports with it
+    try:
+        requests.delete(f"http://localhost:{server[1]}/api/reports/{job_id}", timeout=5)
+    except Exception as e:
+        print(f"Error expiring report {job_id}: {str(e)}")
+
+
+def stop_report_server():
+    global _server
+    with _server_lock:
+        if _server is not None:
+            stop_dash_process(_server[0])
+            _server = None
+
+
+atexit.register(stop_report_server)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+# Пороги |z * вес| для уровней риска 0 / 1 / 2
+RISK_CUTOFFS = (1.54, 1.96)
+
+
+def read_ref_stats_table(ref_data_path):
+    """Ref_stats sheet as numeric DataFrame: rows are stats (mean, sd, ...), columns are metabolites"""
+    return (
+        pd.read_excel(ref_data_path, header=None)
+        .pipe(lambda df: df.set_axis(['stat'] + list(df.iloc[0, 1:]), axis=1)
+        .drop(0)
+        .set_index('stat')
+        .apply(lambda x: pd.to_numeric(x.astype(str).str.replace(',', '.'), errors='coerce'))
+        ))
+
+
+def align_reference(markers, ref_stats):
+    """Return (mean, sd) arrays aligned with markers, NaN where reference is missing"""
+    ref_stats = ref_stats.loc[:, ~ref_stats.columns.duplicated()]
+    mean = ref_stats.loc['mean'].reindex(markers).to_numpy(dtype=np.float64)
+    sd = ref_stats.loc['sd'].reindex(markers).to_numpy(dtype=np.float64)
+    return mean, sd
+
+
+def marker_values(metabolic_data, markers):
+    """
+    Patients x markers matrix of concentrations.
+    Missing markers, NaN and inf give NaN; negative values are replaced with 0.
+    """
+    metabolic_data = metabolic_data.loc[:, ~metabolic_data.columns.duplicated()]
+    values = metabolic_data.reindex(columns=markers).to_numpy(dtype=np.float64)
+    values[np.isinf(values)] = np.nan
+    return np.maximum(values, 0)
+
+
+def zscore_matrix(values, mean, sd):
+    """Z-scores rounded to 2 decimals, NaN where sd is missing or not positive"""
+    valid_sd = ~np.isnan(sd) & (sd > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_scores = np.round((values - mean) / sd, 2)
+    return np.where(valid_sd, z_scores, np.nan)
+
+
+def risk_level_matrix(z_scores, weights):
+    """Risk level 0 / 1 / 2 by |z * weight| cutoffs, NaN where z-score is NaN"""
+    low, high = RISK_CUTOFFS
+    weighted = np.abs(z_scores * np.asarray(weights, dtype=np.float64))
+    return np.select(
+        [weighted < low, weighted <= high, weighted > high],
+        [0.0, 1.0, 2.0],
+        default=np.nan,
+    )
+
+
+def subgroup_score_matrix(risk_levels, categories):
+    """
+    Patients x categories DataFrame with subgroup scores in percent of the maximum
+    (2 points per marker). A category with any NaN level scores NaN.
+    """
+    levels = pd.DataFrame(risk_levels.T, index=pd.Index(categories, name='Категория'))
+    grouped = levels.groupby(level=0)
+    scores = grouped.sum() / (grouped.size() * 2).to_numpy()[:, None] * 100
+    scores = scores.where(~levels.isna().groupby(level=0).any())
+    return scores.T
+
+
+def score_markers(risk_params, metabolic_data, ref_stats):
+    """
+    Score every patient (row of metabolic_data) against risk_params markers at once.
+
+    Returns dict of aligned arrays/frames:
+        values   - patients x markers concentrations
+        z_scores - patients x markers z-scores
+        levels   - patients x markers risk levels
+        subgroup - patients x categories subgroup scores (DataFrame)
+    """
+    markers = risk_params['Маркер / Соотношение'].tolist()
+    mean, sd = align_reference(markers, ref_stats)
+
+    values = marker_values(metabolic_data, markers)
+    z_scores = zscore_matrix(values, mean, sd)
+    levels = risk_level_matrix(z_scores, risk_params['веса'].to_numpy())
+    subgroup = subgroup_score_matrix(levels, risk_params['Категория'].to_numpy())
+    subgroup.index = metabolic_data.index
+
+    return {
+        'values': values,
+        'z_scores': z_scores,
+        'levels': levels,
+        'subgroup': subgroup,
+    }
+
+
+def ref_stats_table_from_frame(ref_sheet):
+    """Same as read_ref_stats_table, but for Ref_stats sheet already loaded as DataFrame"""
+    ref_stats = ref_sheet.set_index(ref_sheet.columns[0]).rename_axis('stat')
+    ref_stats.columns.name = None
+    return ref_stats.apply(
+        lambda x: pd.to_numeric(x.astype(str).str.replace(',', '.'), errors='coerce')
+    )
+
+
+def score_cohort(risk_params, metabolic_data, ref_stats):
+    """
+    Long-form result for all patients: risk_params repeated per patient with
+    Patient, Z_score and Subgroup_score columns, plus patient_index (row label
+    of metabolic_data). Blocks are in metabolic_data row order.
+    """
+    scores = score_markers(risk_params, metabolic_data, ref_stats)
+    n_patients = len(metabolic_data)
+    n_markers = len(risk_params)
+
+    result = risk_params.iloc[np.tile(np.arange(n_markers), n_patients)].reset_index(drop=True)
+    result.insert(0, 'patient_index', np.repeat(metabolic_data.index.to_numpy(), n_markers))
+    result['Patient'] = scores['values'].ravel()
+    result['Z_score'] = scores['z_scores'].ravel()
+
+    # Оценки подгрупп: (пациент, категория) -> процент
+    subgroup = scores['subgroup'].stack(future_stack=True)
+    keys = pd.MultiIndex.from_arrays([result['patient_index'], result['Категория']])
+    result['Subgroup_score'] = subgroup.reindex(keys).to_numpy()
+    return result
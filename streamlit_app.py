@@ -14,6 +14,23 @@ import requests
 import shutil
 
 from streamlit_utilit import *
+from pathlib import Path
+from report_bundle import save_report_bundle
+from report_builder import render_report_html
+from reference_store import REF_FILE, load_reference_store, validate_reference
+from ref_snapshots import RefSnapshots, snapshot_ref_stats, snapshot_ref_stats_table
+from ui_kit.dash_utilit import PLOT_FORMATS
+from ui_kit.plot_pool import warm_up_plot_workers
+from browser_pool import find_free_port
+from report_server import get_report_server_url, release_report, submit_report
+
+# "static" - HTML is rendered in-process and printed from disk,
+# "server" - page is published on the resident report_server.py,
+# "dash" - a main.py process is started for every report
+REPORT_RENDER_MODE = "static"
+
+# Default chart format in the form: "png" - 300 dpi raster, "svg" keeps charts vector (smaller HTML and PDF)
+REPORT_PLOT_FORMAT = "png"
 
 def validate_inputs(name, file1):
     """Validate user inputs before processing"""
@@ -51,9 +68,16 @@ def main():
         </style>
     """, unsafe_allow_html=True)
 
-    # Path to the reference file
-    REF_FILE = "Ref.xlsx"
-    
+    # Load ML models once per process (no-op on reruns)
+    warm_up_pipelines()
+    # PDF browsers start in the background, also once per process
+    warm_up_browsers()
+    if REPORT_RENDER_MODE == "static":
+        # Static pages are built in this process, so plot workers live here too
+        warm_up_plot_workers()
+    if REPORT_RENDER_MODE == "server":
+        get_report_server_url()
+
     # Initialize session state for processed data
     if 'processed_data' not in st.session_state:
         st.session_state.processed_data = None
@@ -76,6 +100,10 @@ def main():
                 date = st.date_input("Дата отчета", datetime.now(), format="DD.MM.YYYY")
             
             layout = st.selectbox("Тип отчета", ("basic", "recommendation"), index=0)
+            plot_format = st.selectbox(
+                "Формат графиков", PLOT_FORMATS, index=PLOT_FORMATS.index(REPORT_PLOT_FORMAT),
+                help="svg - векторные графики (меньше размер PDF), png - растровые 300 dpi"
+            )
             
             st.write("Загрузите данные")
             
@@ -92,17 +120,16 @@ def main():
         
         if os.path.exists(REF_FILE):
             try:
-                # Initialize session state for both original and edited data
-                if 'original_ref' not in st.session_state or 'edited_ref' not in st.session_state:
-                    xls = pd.ExcelFile(REF_FILE)
-                    st.session_state.original_ref = {
-                        sheet_name: xls.parse(sheet_name) 
-                        for sheet_name in xls.sheet_names
-                    }
-                    st.session_state.edited_ref = {
-                        sheet_name: df.copy() 
-                        for sheet_name, df in st.session_state.original_ref.items()
-                    }
+                # Workbook is parsed once per process; sessions start over when the file changes
+                ref_store = load_reference_store(REF_FILE)
+                if (st.session_state.get('ref_fingerprint') != ref_store.fingerprint
+                        or 'original_ref' not in st.session_state or 'edited_ref' not in st.session_state):
+                    # original_ref is shared between sessions and never modified
+                    st.session_state.original_ref = ref_store.sheets
+                    st.session_state.edited_ref = ref_store.sheet_copies()
+                    st.session_state.ref_fingerprint = ref_store.fingerprint
+                    # Edits are snapshotted (versioned Parquet) on every submit
+                    st.session_state.ref_snapshots = RefSnapshots(ref_store)
                 
                 # Create tabs for each sheet
                 tabs = st.tabs(st.session_state.edited_ref.keys())
@@ -149,27 +176,34 @@ def main():
                 st.error("Reference data not loaded")
                 return
 
-            required_sheets = ['Params_metaboscan', 'Ref_stats']
-            for sheet in required_sheets:
-                if sheet not in st.session_state.edited_ref:
-                    st.error(f"Required sheet '{sheet}' not found in reference file")
-                    return
+            problems = validate_reference(st.session_state.edited_ref)
+            if problems:
+                for problem in problems:
+                    st.error(problem)
+                return
 
             with st.spinner("🔬 Читаем данные и генерируем отчет. Это займет не больше минуты..."):
                 with tempfile.TemporaryDirectory() as temp_dir:
                     try:
-                        # Save Params_metaboscan sheet as temporary file
-                        risk_params_path = os.path.join(temp_dir, "risk_params.xlsx")
-                        st.session_state.edited_ref['Params_metaboscan'].to_excel(risk_params_path, index=False)
-
-                        # Save Ref_stats sheet as temporary file
-                        ref_stats_path = os.path.join(temp_dir, "Ref_stats.xlsx")
-                        st.session_state.edited_ref['Ref_stats'].to_excel(ref_stats_path, index=False)
+                        risk_params = st.session_state.edited_ref['Params_metaboscan']
+                        # Snapshot of the edits; derived tables are reused while its hash is the same
+                        ref_snapshots = st.session_state.ref_snapshots
+                        ref_version = ref_snapshots.commit(st.session_state.edited_ref)
+                        ref_stats_sheet = snapshot_ref_stats_table(ref_snapshots, ref_version)
 
                         # Process data
                         metabolomic_data_with_ratios = calculate_metabolite_ratios(metabolomic_data)
-                        metabolomic_data_with_ratios_path = os.path.join(temp_dir, "metabolomic_data.xlsx")
-                        metabolomic_data_with_ratios.to_excel(metabolomic_data_with_ratios_path, index=False)
+                        clipped_counts = metabolomic_data_with_ratios.attrs.get('clipped_negative_counts')
+                        if clipped_counts:
+                            st.warning(
+                                "Отрицательные значения заменены на 0: "
+                                + ", ".join(f"{col} ({n})" for col, n in clipped_counts.items())
+                            )
+                        
+                        # Z-scores and subgroup scores for all patients in one pass (in memory)
+                        cohort_risk_params_exp = prepare_final_dataframe_cohort(
+                            risk_params, metabolomic_data_with_ratios, ref_stats_sheet
+                        )
                         
                         # Check if input file contains multiple patients (more than 1 row after header)
                         df_metabolomic = pd.read_excel(metabolomic_data)
@@ -191,11 +225,13 @@ def main():
                                     with st.spinner(f"Расчет показателей для пациента {idx+1}/{len(patient_ids)}..."):
                                         # Get individual patient data
                                         patient_data = metabolomic_data_with_ratios.iloc[[idx]]
-                                        patient_data_path = os.path.join(temp_dir, f"patient_data_{idx}.xlsx")
-                                        patient_data.to_excel(patient_data_path, index=False)
                                         
-                                        # Calculate risk parameters for this patient only
-                                        patient_risk_params_exp = prepare_final_dataframe(risk_params_path, patient_data_path, ref_stats_path)
+                                        # Risk parameters for this patient only
+                                        patient_risk_params_exp = (
+                                            cohort_risk_params_exp[cohort_risk_params_exp['patient_index'] == patient_data.index[0]]
+                                            .drop(columns='patient_index')
+                                            .reset_index(drop=True)
+                                        )
                                         
                                         # Calculate risk scores for this patient only
                                         patient_risk_scores = calculate_risks(patient_risk_params_exp, patient_data)
@@ -222,16 +258,10 @@ def main():
                                                 use_container_width=True
                                             )
                         else:  # Single patient case (original behavior)
-                            risk_params_exp = prepare_final_dataframe(risk_params_path, metabolomic_data_with_ratios_path, ref_stats_path)
-                            risk_params_exp_path = os.path.join(temp_dir, "risk_exp_params.xlsx")
-                            risk_params_exp.to_excel(risk_params_exp_path, index=False)
+                            risk_params_exp = cohort_risk_params_exp.drop(columns='patient_index')
                                 
                             risk_scores = calculate_risks(risk_params_exp, metabolomic_data_with_ratios)
-                            risk_scores_path = os.path.join(temp_dir, "risk_scores.xlsx")
-                            risk_scores.to_excel(risk_scores_path, index=False)
                             
-                            metrics_path = os.path.join(temp_dir, "metrics.xlsx")
-                            st.session_state.edited_ref['metrics_ml_models'].to_excel(metrics_path, index=False)
                             st.info("✅ Предварительный просмотр рассчитанных значений!")
                             cols = st.columns(2)
                             with cols[0]:
@@ -246,13 +276,15 @@ def main():
                                 "risk_params_exp": risk_params_exp,
                                 "metabolomic_data_with_ratios": metabolomic_data_with_ratios,
                                 "ref_stats": st.session_state.edited_ref['Ref_stats'],
+                                "ref_stats_dict": snapshot_ref_stats(ref_snapshots, ref_version),
                                 "metrics": st.session_state.edited_ref['metrics_ml_models'],
                                 "patient_info": {
                                     "name": name.strip(),
                                     "age": age,
                                     "date": date.strftime("%d.%m.%Y"),
                                     "gender": gender,
-                                    "layout": layout
+                                    "layout": layout,
+                                    "plot_format": plot_format
                                 }
                             }
                             
@@ -260,29 +292,9 @@ def main():
                             if layout == "basic":
                                 # Generate basic report immediately
                                 with tempfile.TemporaryDirectory() as report_temp_dir:
-                                    # Save data to temporary files for report generation
-                                    risk_scores_path = os.path.join(report_temp_dir, "risk_scores.xlsx")
-                                    st.session_state.processed_data["risk_scores"].to_excel(risk_scores_path, index=False)
-                                    
-                                    risk_params_exp_path = os.path.join(report_temp_dir, "risk_exp_params.xlsx")
-                                    st.session_state.processed_data["risk_params_exp"].to_excel(risk_params_exp_path, index=False)
-                                    
-                                    metabolomic_data_with_ratios_path = os.path.join(report_temp_dir, "metabolomic_data.xlsx")
-                                    st.session_state.processed_data["metabolomic_data_with_ratios"].to_excel(metabolomic_data_with_ratios_path, index=False)
-                                    
-                                    ref_stats_path = os.path.join(report_temp_dir, "Ref_stats.xlsx")
-                                    st.session_state.processed_data["ref_stats"].to_excel(ref_stats_path, index=False)
-                                    
-                                    metrics_path = os.path.join(report_temp_dir, "metrics.xlsx")
-                                    st.session_state.processed_data["metrics"].to_excel(metrics_path, index=False)
-                                    
                                     report_path = generate_pdf_report(
                                         st.session_state.processed_data["patient_info"],
-                                        risk_scores_path,
-                                        risk_params_exp_path,
-                                        metabolomic_data_with_ratios_path,
-                                        ref_stats_path,
-                                        metrics_path,
+                                        st.session_state.processed_data,
                                         report_temp_dir
                                     )
                                     
@@ -341,22 +353,6 @@ def main():
         if submitted_recommendation:
             with st.spinner("Генерируем отчет с рекомендациями..."):
                 with tempfile.TemporaryDirectory() as report_temp_dir:
-                    # Save data to temporary files for report generation
-                    risk_scores_path = os.path.join(report_temp_dir, "risk_scores.xlsx")
-                    st.session_state.processed_data["risk_scores"].to_excel(risk_scores_path, index=False)
-                    
-                    risk_params_exp_path = os.path.join(report_temp_dir, "risk_exp_params.xlsx")
-                    st.session_state.processed_data["risk_params_exp"].to_excel(risk_params_exp_path, index=False)
-                    
-                    metabolomic_data_with_ratios_path = os.path.join(report_temp_dir, "metabolomic_data.xlsx")
-                    st.session_state.processed_data["metabolomic_data_with_ratios"].to_excel(metabolomic_data_with_ratios_path, index=False)
-                    
-                    ref_stats_path = os.path.join(report_temp_dir, "Ref_stats.xlsx")
-                    st.session_state.processed_data["ref_stats"].to_excel(ref_stats_path, index=False)
-                    
-                    metrics_path = os.path.join(report_temp_dir, "metrics.xlsx")
-                    st.session_state.processed_data["metrics"].to_excel(metrics_path, index=False)
-                    
                     # Add messages to patient info
                     patient_info_with_messages = st.session_state.processed_data["patient_info"].copy()
                     patient_info_with_messages["doctor_message"] = st.session_state.doctor_message
@@ -366,11 +362,7 @@ def main():
                     # Generate report with recommendations
                     report_path = generate_pdf_report(
                         patient_info_with_messages,
-                        risk_scores_path,
-                        risk_params_exp_path,
-                        metabolomic_data_with_ratios_path,
-                        ref_stats_path,
-                        metrics_path,
+                        st.session_state.processed_data,
                         report_temp_dir
                     )
                     
@@ -389,121 +381,68 @@ def main():
                     else:
                         st.error("Ошибка при генерации отчета с рекомендациями")
 
-def generate_pdf_report(patient_info, risk_scores_path, risk_params_exp_path, 
-                       metabolomic_data_with_ratios_path, ref_stats_path, metrics_path, output_dir):
-    """Generate PDF report with enhanced error handling and Dash error reporting"""
+def generate_pdf_report(patient_info, processed_data, output_dir, render_mode=REPORT_RENDER_MODE,
+                        ready_timeout=REPORT_READY_TIMEOUT):
+    """
+    Generate PDF report with enhanced error handling and Dash error reporting.
+
+    render_mode "static" builds the page in-process (report_builder.render_report_html)
+    and prints it from disk; "server" publishes it on the resident report server
+    under /report/<job_id>; "dash" serves it with main.py as before.
+    Printing starts once the page reports it is ready, or after ready_timeout seconds.
+    """
     dash_process = None
-    driver = None
+    report_job_id = None
     
     try:
-        # Clean up any existing Dash instance
-        kill_dash_app(8050)
-        time.sleep(2)
-        
-        # Start Dash process with required data
-        dash_command = [
-            sys.executable,
-            "main.py",
-            "--name", patient_info['name'],
-            "--age", str(patient_info['age']),
-            "--gender", patient_info['gender'],
-            "--date", patient_info['date'],
-            "--layout", patient_info['layout'],
-            "--risk_scores", risk_scores_path,
-            "--risk_params", risk_params_exp_path,
-            "--metabolomic_data", metabolomic_data_with_ratios_path,
-            "--ref_stats", ref_stats_path,
-            "--metrics", metrics_path,
-        ]
-        
-        # Add messages if they exist (for recommendation layout)
-        if 'doctor_message' in patient_info:
-            dash_command.extend(["--doctor_message", patient_info['doctor_message']])
-        if 'patient_message' in patient_info:
-            dash_command.extend(["--patient_message", patient_info['patient_message']])
-        if 'patient_long_message' in patient_info:
-            dash_command.extend(["--patient_long_message", patient_info['patient_long_message']])
-        
-        dash_process = subprocess.Popen(
-            dash_command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1  # Line buffering
-        )
-        
-        # Read Dash output in real-time
-        dash_output = []
-        dash_errors = []
-        
-        def read_output(stream, output_list):
-            for line in stream:
-                output_list.append(line)
-                if "DASH_APP_ERROR:" in line:
-                    # Found an error - extract meaningful part
-                    error_msg = line.split("DASH_APP_ERROR:")[1].strip()
-                    st.error(f"Dash App Error: {error_msg}")
-                elif "DASH_APP_STATUS:" in line:
-                    # Status update from Dash
-                    status = line.split("DASH_APP_STATUS:")[1].strip()
-                    st.info(f"Dash App Status: {status}")
-        
-        # Start threads to read output and error streams
-        output_thread = threading.Thread(
-            target=read_output,
-            args=(dash_process.stdout, dash_output)
-        )
-        error_thread = threading.Thread(
-            target=read_output,
-            args=(dash_process.stderr, dash_errors)
-        )
-        output_thread.start()
-        error_thread.start()
-        
-        # Wait for Dash to start or fail
-        if not wait_for_dash_app(timeout=30):
-            output_thread.join(timeout=1)
-            error_thread.join(timeout=1)
-            
-            # Check if we captured any errors
-            combined_output = "\n".join(dash_output + dash_errors)
-            if "DASH_APP_ERROR:" in combined_output:
-                error_msg = combined_output.split("DASH_APP_ERROR:")[1].split("\n")[0]
-                raise Exception(f"Dash app failed: {error_msg}")
-            else:
-                raise Exception("Dash app failed to start (timeout)")
-        
-        # Generate PDF
-        driver = setup_chrome_driver()
-        driver.get("http://localhost:8050")
-        
-        # Wait for page to load with progress indicator
-        with st.spinner("Generating PDF report..."):
-            time.sleep(5)  # Adjust based on your app's load time
-            
-            pdf_path = os.path.join(output_dir, "report.pdf")
-            print_settings = {
-                "printBackground": True,
-                "paperWidth": 8.27,
-                "paperHeight": 11.69,
-                "scale": 0.89,
-                "margin": {
-                    "top": "0.0in",
-                    "bottom": "0.0in",
-                    "left": "0.25in",
-                    "right": "0.25in"
+        tables = {
+            "risk_scores": processed_data["risk_scores"],
+            "risk_params": processed_data["risk_params_exp"],
+            "metabolomic_data": processed_data["metabolomic_data_with_ratios"],
+            "ref_stats": processed_data["ref_stats"],
+            "metrics": processed_data["metrics"],
+        }
+
+        if render_mode == "static":
+            html_path = render_report_html(patient_info, tables, os.path.join(output_dir, "report.html"),
+                                           ref_stats=processed_data.get("ref_stats_dict"))
+            page_url = Path(html_path).resolve().as_uri()
+        elif render_mode == "server":
+            report_job_id, page_url = submit_report(patient_info, tables)
+        else:
+            dash_process, port = start_dash_report(patient_info, tables, output_dir)
+            page_url = f"http://localhost:{port}"
+
+        # Generate PDF in a warm browser from the pool
+        with get_browser_pool().lease() as driver:
+            # Wait for page to load with progress indicator
+            with st.spinner("Generating PDF report..."):
+                if not load_report_page(driver, page_url, timeout=ready_timeout):
+                    st.warning(f"Отчет не успел полностью загрузиться за {ready_timeout} с, PDF может быть неполным")
+                
+                pdf_path = os.path.join(output_dir, "report.pdf")
+                print_settings = {
+                    "printBackground": True,
+                    "paperWidth": 8.27,
+                    "paperHeight": 11.69,
+                    "scale": 0.89,
+                    "margin": {
+                        "top": "0.0in",
+                        "bottom": "0.0in",
+                        "left": "0.25in",
+                        "right": "0.25in"
+                    }
                 }
-            }
-            
-            try:
-                pdf_data = driver.execute_cdp_cmd("Page.printToPDF", print_settings)
-                with open(pdf_path, "wb") as f:
-                    f.write(base64.b64decode(pdf_data['data']))
                 
-                return pdf_path
-            except Exception as e:
-                st.error(f"PDF generation failed: {str(e)}")
-                return None
+                try:
+                    pdf_data = driver.execute_cdp_cmd("Page.printToPDF", print_settings)
+                    with open(pdf_path, "wb") as f:
+                        f.write(base64.b64decode(pdf_data['data']))
+                    
+                    return pdf_path
+                except Exception as e:
+                    st.error(f"PDF generation failed: {str(e)}")
+                    return None
                 
     except Exception as e:
         st.error(f"{str(e)}")
@@ -511,31 +450,77 @@ def generate_pdf_report(patient_info, risk_scores_path, risk_params_exp_path,
         return None
         
     finally:
-        # Cleanup resources
-        if driver:
-            driver.quit()
+        # Cleanup resources (the browser goes back to the pool on its own)
+        if report_job_id:
+            release_report(report_job_id)
         if dash_process:
-            try:
-                dash_process.terminate()
-                dash_process.wait(timeout=5)
-            except:
-                try:
-                    dash_process.kill()
-                except:
-                    pass
-        kill_dash_app(8050)
+            stop_dash_process(dash_process)
+
+def start_dash_report(patient_info, tables, output_dir):
+    """
+    Start main.py serving the report on a free port of its own.
+
+    Returns (process, port) once the server answers; several reports can run at once.
+    """
+    port = find_free_port()
+    
+    # All report data goes to main.py in a single bundle file
+    bundle_path = save_report_bundle(
+        os.path.join(output_dir, "report_bundle.json"), patient_info, tables
+    )
+    dash_command = [sys.executable, "main.py", "--bundle", bundle_path, "--port", str(port)]
+    
+    dash_process = subprocess.Popen(
+        dash_command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        bufsize=1  # Line buffering
+    )
+    
+    # Read Dash output in real-time
+    dash_output = []
+    dash_errors = []
+    
+    def read_output(stream, output_list):
+        for line in stream:
+            output_list.append(line)
+            if "DASH_APP_ERROR:" in line:
+                # Found an error - extract meaningful part
+                error_msg = line.split("DASH_APP_ERROR:")[1].strip()
+                st.error(f"Dash App Error: {error_msg}")
+            elif "DASH_APP_STATUS:" in line:
+                # Status update from Dash
+                status = line.split("DASH_APP_STATUS:")[1].strip()
+                st.info(f"Dash App Status: {status}")
+    
+    # Start threads to read output and error streams
+    output_thread = threading.Thread(
+        target=read_output,
+        args=(dash_process.stdout, dash_output)
+    )
+    error_thread = threading.Thread(
+        target=read_output,
+        args=(dash_process.stderr, dash_errors)
+    )
+    output_thread.start()
+    error_thread.start()
+    
+    # Wait for Dash to start or fail
+    if not wait_for_dash_app(port, dash_process, timeout=30):
+        stop_dash_process(dash_process)
+        output_thread.join(timeout=1)
+        error_thread.join(timeout=1)
+        
+        # Check if we captured any errors
+        combined_output = "\n".join(dash_output + dash_errors)
+        if "DASH_APP_ERROR:" in combined_output:
+            error_msg = combined_output.split("DASH_APP_ERROR:")[1].split("\n")[0]
+            raise Exception(f"Dash app failed: {error_msg}")
+        else:
+            raise Exception("Dash app failed to start (timeout)")
 
-def wait_for_dash_app(timeout=30):
-    """Check if Dash app is ready"""
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        try:
-            response = requests.get("http://localhost:8050/_alive", timeout=5)
-            if response.status_code == 200:
-                return True
-        except requests.exceptions.RequestException:
-            time.sleep(2)
-    return False
+    return dash_process, port
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,198 +2,77 @@ from types import CodeType
 import pandas as pd
 import numpy as np
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service #для корректной работы на сервере
 import subprocess
 import logging
 import requests
-import psutil
 from glob import glob
+from models.base_pipeline import BaseDiseasePipeline
+from ratio_formulas import get_ratio_plan
+from risk_scoring import read_ref_stats_table, ref_stats_table_from_frame, score_cohort, score_markers
+from models.registry import DISEASE_PIPELINES, get_pipeline, warm_up as warm_up_pipelines
+from dash_process import stop_dash_process, wait_for_dash_app
+from browser_pool import (REPORT_READY_TIMEOUT, create_chrome_driver, get_browser_pool, load_report_page,
+                          warm_up_in_background as warm_up_browsers)
 
 
 
+# Колонки-идентификаторы, которые не участвуют в обработке значений
+IDENTIFIER_COLUMNS = ('Код', 'Группа', 'Group')
+
+
+def _is_real_number(value):
+    """Python or numpy int/float cell (not bool, not text)"""
+    return pd.api.types.is_number(value) and not isinstance(value, (bool, np.bool_, complex, np.complexfloating))
+
+
+def clip_negative_values(data, identifier_columns=IDENTIFIER_COLUMNS):
+    """
+    Replace negative concentrations with 0, leaving identifier columns untouched.
+
+    Returns (clipped DataFrame, {column: number of clipped values}) for QC.
+    """
+    columns = data.columns
+    value_columns = [col for col in columns if col not in identifier_columns]
+    clipped_counts = {}
+
+    # Numeric columns: one vectorized clip for the whole block, dtypes are kept
+    numeric_columns = data[value_columns].select_dtypes(include='number').columns
+    if len(numeric_columns):
+        values = data[numeric_columns]
+        clipped_counts.update((values < 0).sum().to_dict())
+        data = pd.concat(
+            [data.drop(columns=numeric_columns), values.clip(lower=0)], axis=1
+        )[columns]
+
+    # Mixed object columns: only real numbers are clipped, text is kept as is
+    object_columns = data[value_columns].select_dtypes(include='object').columns
+    if len(object_columns):
+        data = data.copy()
+    for col in object_columns:
+        is_number = data[col].map(_is_real_number).astype(bool)
+        negative = is_number & (pd.to_numeric(data[col].where(is_number), errors='coerce') < 0)
+        clipped_counts[col] = int(negative.sum())
+        data.loc[negative, col] = 0
+
+    clipped_counts = {col: int(n) for col, n in clipped_counts.items() if n}
+    return data, clipped_counts
+
+
 def calculate_metabolite_ratios(metabolomic_data):
     """Calculate all metabolite ratios from raw metabolomic data"""
     # Read data
     data = pd.read_excel(metabolomic_data)
     
-    # Replace all negative values with 0 in the entire DataFrame
-    data = data.map(lambda x: 0 if isinstance(x, (int, float)) and x < 0 else x)
+    # Replace all negative values with 0 (counts are kept in attrs for QC)
+    data, clipped_counts = clip_negative_values(data)
     
     try:
-        # Prepare all new columns in a dictionary first
-        new_columns = {}
-        
-        # Acylcarnitines
-        new_columns['(C2+C3)/C0'] = (data['C2'] + data['C3']) / data['C0']
-        new_columns['CACT Deficiency (NBS)'] = data['C0'] / (data['C16'] + data['C18'])
-        new_columns['CPT-1 Deficiency (NBS)'] = (data['C16'] + data['C18']) / data['C0']
-        new_columns['CPT-2 Deficiency (NBS)'] = (data['C16'] + data['C18']) / data['C2']
-        new_columns['EMA (NBS)'] = data['C4'] / data['C8']
-        new_columns['IBD Deficiency (NBS)'] = data['C4'] / data['C2']
-        new_columns['IVA (NBS)'] = data['C5'] / data['C2']
-        new_columns['LCHAD Deficiency (NBS)'] = data['C16-OH'] / data['C16']
-        new_columns['MA (NBS)'] = data['C3'] / data['C2']
-        new_columns['MC Deficiency (NBS)'] = data['C16'] / data['C3']
-        new_columns['MCAD Deficiency (NBS)'] = data['C8'] / data['C2']
-        new_columns['MCKAT Deficiency (NBS)'] = data['C8'] / data['C10']
-        new_columns['MMA (NBS)'] = data['C3'] / data['C0']
-        new_columns['PA (NBS)'] = data['C3'] / data['C16']
-        new_columns['С2/С0'] = data['C2'] / data['C0']
-        new_columns['Ratio of Acetylcarnitine to Carnitine'] = data['C2'] / data['C0']
-        
-        # Calculate sums once to reuse
-        sum_AC_OHs = (data['C5-OH'] + data['C14-OH'] + data['C16-1-OH'] + 
-                     data['C16-OH'] + data['C18-1-OH'] + data['C18-OH'])
-        sum_ACs = (data['C0'] + data['C10'] + data['C10-1'] + data['C10-2'] + 
-                  data['C12'] + data['C12-1'] + data['C14'] + data['C14-1'] + 
-                  data['C14-2'] + data['C16'] + data['C16-1'] + data['C18'] + 
-                  data['C18-1'] + data['C18-2'] + data['C2'] + data['C3'] + 
-                  data['C4'] + data['C5'] + data['C5-1'] + data['C5-DC'] + 
-                  data['C6'] + data['C6-DC'] + data['C8'] + data['C8-1'])
-        
-        new_columns['Ratio of AC-OHs to ACs'] = sum_AC_OHs / sum_ACs
-        
-        СДК = (data['C14'] + data['C14-1'] + data['C14-2'] + data['C14-OH'] + 
-               data['C16'] + data['C16-1'] + data['C16-1-OH'] + data['C16-OH'] + 
-               data['C18'] + data['C18-1'] + data['C18-1-OH'] + data['C18-2'] + 
-               data['C18-OH'])
-        ССК = (data['C6'] + data['C6-DC'] + data['C8'] + data['C8-1'] + 
-               data['C10'] + data['C10-1'] + data['C10-2'] + data['C12'] + 
-               data['C12-1'])
-        СКК = (data['C2'] + data['C3'] + data['C4'] + data['C5'] + data['C5-1'] + 
-               data['C5-DC'] + data['C5-OH'])
-        
-        new_columns['СДК'] = СДК
-        new_columns['ССК'] = ССК
-        new_columns['СКК'] = СКК
-        new_columns['Ratio of Medium-Chain to Long-Chain ACs'] = ССК / СДК
-        new_columns['Ratio of Short-Chain to Long-Chain ACs'] = СКК / СДК
-        new_columns['Ratio of Short-Chain to Medium-Chain ACs'] = СКК / ССК
-        new_columns['SBCAD Deficiency (NBS)'] = data['C5'] / data['C0']
-        new_columns['SCAD Deficiency (NBS)'] = data['C4'] / data['C3']
-        new_columns['Sum of ACs'] = sum_AC_OHs + sum_ACs - data['C0']  # Subtract C0 since it's included in sum_ACs
-        new_columns['Sum of ACs + С0'] = sum_AC_OHs + sum_ACs
-        new_columns['Sum of ACs/C0'] = (sum_AC_OHs + sum_ACs - data['C0']) / data['C0']
-        
-        new_columns['Sum of MUFA-ACs'] = (data['C16-1-OH'] + data['C18-1-OH'] + 
-                                        data['C10-1'] + data['C12-1'] + 
-                                        data['C14-1'] + data['C16-1'] + 
-                                        data['C18-1'] + data['C8-1'] + 
-                                        data['C5-1'])
-        new_columns['Sum of PUFA-ACs'] = data['C10-2'] + data['C14-2'] + data['C18-2']
-        new_columns['TFP Deficiency (NBS)'] = data['C16'] / data['C16-OH']
-        new_columns['VLCAD Deficiency (NBS)'] = data['C14-1'] / data['C16']
-        new_columns['(C6+C8+C10)/C2'] = (data['C6'] + data['C8'] + data['C10']) / data['C2']
-        new_columns['2MBG (NBS)'] = data['C5'] / data['C3']
-        new_columns['Carnitine Uptake Defect (NBS)'] = (data['C0'] + data['C2'] + data['C3'] + 
-                                                       data['C16'] + data['C18'] + 
-                                                       data['C18-1']) / data['Citrulline']
-
-        new_columns['C2 / C3'] = data['C2'] / data['C3']
-        # NO- and urea cycle
-        new_columns['GABR'] = data['Arginine'] / (data['Ornitine'] + data['Citrulline'])
-        new_columns['Orn Synthesis'] = data['Ornitine'] / data['Arginine']
-        new_columns['AOR'] = data['Arginine'] / data['Ornitine']
-        new_columns['ADMA/(Adenosin+Arginine)'] = data['ADMA'] / (data['Adenosin'] + data['Arginine'])
-        new_columns["Asymmetrical Arg Methylation"] = data['ADMA'] / data['Arginine']
-        new_columns['Symmetrical Arg Methylation'] = data['TotalDMA (SDMA)'] / data['Arginine']
-        new_columns['(Arg+HomoArg)/ADMA'] = (data['Arginine'] + data['Homoarginine']) / data['ADMA']
-        new_columns['ADMA / NMMA'] = data['ADMA'] / data['NMMA']
-        new_columns['NO-Synthase Activity'] = data['Citrulline'] / data['Arginine']
-        new_columns['OTC Deficiency (NBS)'] = data['Ornitine'] / data['Citrulline']
-        new_columns['Ratio of HArg to ADMA'] = data['Homoarginine'] / data['ADMA']
-        new_columns['Ratio of HArg to SDMA'] = data['Homoarginine'] / data['TotalDMA (SDMA)']
-        new_columns['Sum of Asym. and Sym. Arg Methylation'] = (data['TotalDMA (SDMA)'] + data['ADMA']) / data['Arginine']
-        new_columns['Sum of Dimethylated Arg'] = data['TotalDMA (SDMA)'] + data['ADMA']
-        new_columns['Cit Synthesis'] = data['Citrulline'] / data['Ornitine']
-        new_columns['CPS Deficiency (NBS)'] = data['Citrulline'] / data['Phenylalanine']
-        new_columns['HomoArg Synthesis'] = data['Homoarginine'] / (data['Arginine'] + data['Lysine'])
-        new_columns['Ratio of Pro to Cit'] = data['Proline'] / data['Citrulline']
-
-        # Tryptophan metabolism
-        new_columns['Kynurenine / Trp'] = data['Kynurenine'] / data['Tryptophan']
-        new_columns['Serotonin / Trp'] = data['Serotonin'] / data['Tryptophan']
-        new_columns['Trp/(Kyn+QA)'] = data['Tryptophan'] / (data['Kynurenine'] + data['Quinolinic acid'])
-        new_columns['Kyn/Quin'] = data['Kynurenine'] / data['Quinolinic acid']
-        new_columns['Quin/HIAA'] = data['Quinolinic acid'] / data['HIAA']
-        new_columns['Tryptamine / IAA'] = data['Tryptamine'] / data['Indole-3-acetic acid']
-        new_columns['Kynurenic acid / Kynurenine'] = data['Kynurenic acid'] / data['Kynurenine']
-
-        # Amino acids
-        new_columns['Asn Synthesis'] = data['Asparagine'] / data['Aspartic acid']
-        new_columns['Glutamine/Glutamate'] = data['Glutamine'] / data['Glutamic acid']
-        new_columns['Gly Synthesis'] = data['Glycine'] / data['Serine']
-        new_columns['GSG Index'] = data['Glutamic acid'] / (data['Serine'] + data['Glycine'])
-        new_columns['GSG_index'] = data['Glutamic acid'] / (data['Serine'] + data['Glycine'])
-        new_columns['Sum of Aromatic AAs'] = data['Phenylalanine'] + data['Tyrosin']
-        new_columns['BCAA'] = data['Summ Leu-Ile'] + data['Valine']
-        new_columns['BCAA/AAA'] = (data['Valine'] + data['Summ Leu-Ile']) / (data['Phenylalanine'] + data['Tyrosin'])
-        new_columns['Alanine / Valine'] = data['Alanine'] / data['Valine']
-        new_columns['DLD (NBS)'] = data['Proline'] / data['Phenylalanine']
-        new_columns['MTHFR Deficiency (NBS)'] = data['Methionine'] / data['Phenylalanine']
-        
-        # Calculate sums once for AA ratios
-        sum_non_essential = (data['Alanine'] + data['Arginine'] + data['Asparagine'] + 
-                           data['Aspartic acid'] + data['Glutamine'] + 
-                           data['Glutamic acid'] + data['Glycine'] + data['Proline'] + 
-                           data['Serine'] + data['Tyrosin'])
-        sum_essential = (data['Histidine'] + data['Summ Leu-Ile'] + data['Lysine'] + 
-                        data['Methionine'] + data['Phenylalanine'] + 
-                        data['Threonine'] + data['Tryptophan'] + data['Valine'])
-        
-        new_columns['Ratio of Non-Essential to Essential AAs'] = sum_non_essential / sum_essential
-        new_columns['Sum of AAs'] = sum_non_essential + sum_essential
-        new_columns['Sum of Essential Aas'] = sum_essential
-        new_columns['Sum of Non-Essential AAs'] = sum_non_essential
-        new_columns['Sum of Solely Glucogenic AAs'] = (data['Alanine'] + data['Arginine'] + 
-                                                     data['Asparagine'] + data['Aspartic acid'] + 
-                                                     data['Glutamine'] + data['Glutamic acid'] + 
-                                                     data['Glycine'] + data['Histidine'] + 
-                                                     data['Methionine'] + data['Proline'] + 
-                                                     data['Serine'] + data['Threonine'] + 
-                                                     data['Valine'])
-        new_columns['Sum of Solely Ketogenic AAs'] = data['Summ Leu-Ile'] + data['Lysine']
-        new_columns['Valinemia (NBS)'] = data['Valine'] / data['Phenylalanine']
-        new_columns['Carnosine Synthesis'] = data['Carnosine'] / data['Histidine']
-        new_columns['Histamine Synthesis'] = data['Histamine'] / data['Histidine']
-
-        # Betaine_choline metabolism
-        new_columns['Betaine/choline'] = data['Betaine'] / data['Choline']
-        new_columns['Methionine + Taurine'] = data['Methionine'] + data['Taurine']
-        new_columns['DMG / Choline'] = data['DMG'] / data['Choline']
-        new_columns['TMAO Synthesis'] = data['TMAO'] / (data['Betaine'] + data['C0'] + data['Choline'])
-        new_columns['TMAO Synthesis (direct)'] = data['TMAO'] / data['Choline']
-        new_columns['Met Oxidation'] = data['Methionine-Sulfoxide'] / data['Methionine']
-
-        # Vitamins
-        new_columns['Riboflavin / Pantothenic'] = data['Riboflavin'] / data['Pantothenic']
-
-        # ADDED: Oncology-specific ratios that were missing
-        new_columns['Arg/ADMA'] = data['Arginine'] / data['ADMA']
-        new_columns['Arg/Orn+Cit'] = data['Arginine'] / (data['Ornitine'] + data['Citrulline'])
-        new_columns['Glutamine/Glutamate'] = data['Glutamine'] / data['Glutamic acid']
-        new_columns['Pro/Cit'] = data['Proline'] / data['Citrulline']
-        new_columns['Kyn/Trp'] = data['Kynurenine'] / data['Tryptophan']
-        new_columns['Trp/Kyn'] = data['Tryptophan'] / data['Kynurenine']
-        
-        # Arthritis
-        new_columns['Phe/Tyr'] = data['Phenylalanine'] / data['Tyrosin']
-        new_columns['Glycine/Serine'] = data['Glycine'] / data['Serine']
-        # Lungs
-        new_columns['C4 / C2'] = data['C4'] / data['C2']
-        new_columns['Valine / Alanine'] = data['Valine'] / data['Alanine']
-        # Liver
-        new_columns['C0/(C16+C18)'] = data['C0'] / (data['C16'] + data['C18'])
-        new_columns['(Leu+IsL)/(C3+С5+С5-1+C5-DC)'] = (data['Summ Leu-Ile']) / (data['C3'] + data['C5'] + data['C5-1'] + data['C5-DC'])
-        new_columns['Val/C4'] = data['Valine'] / data['C4']
-        new_columns['(C16+C18)/C2'] = (data['C16'] + data['C18']) / data['C2']
-        new_columns['C3 / C0'] = data['C3'] / data['C0']
+        # Ratios and sums are defined in ratio_formulas.csv and compiled once
+        # into a plan that evaluates every shared subexpression a single time
+        new_columns = get_ratio_plan().evaluate(data)
 
         # Convert the dictionary to a DataFrame
-        new_data = pd.DataFrame(new_columns)
+        new_data = pd.DataFrame(new_columns, index=data.index)
 
         # Get columns that exist in both DataFrames
         common_cols = data.columns.intersection(new_data.columns)
@@ -212,6 +91,7 @@ def calculate_metabolite_ratios(metabolomic_data):
         if 'Group' in data.columns:
             data = data.drop('Group', axis=1)
 
+        data.attrs['clipped_negative_counts'] = clipped_counts
         return data
 
     except Exception as e:
@@ -237,88 +117,65 @@ def prepare_final_dataframe(risk_params_data, metabolomic_data_with_ratios, ref_
     metabolic_data = pd.read_excel(metabolomic_data_with_ratios)
     
     # Загрузка и подготовка референсных данных
-    ref_stats = (
-        pd.read_excel(ref_data_path, header=None)
-        .pipe(lambda df: df.set_axis(['stat'] + list(df.iloc[0, 1:]), axis=1)
-        .drop(0)
-        .set_index('stat')
-        .apply(lambda x: pd.to_numeric(x.astype(str).str.replace(',', '.'), errors='coerce'))
-        ))
+    ref_stats = read_ref_stats_table(ref_data_path)
     
-    # Функция для расчета z-скор
-    def calculate_zscore(metabolite, value):
-        """Рассчитывает z-score для метаболита"""
-        if metabolite not in ref_stats.columns:
-            return np.nan
-            
-        mean = ref_stats.loc['mean', metabolite]
-        sd = ref_stats.loc['sd', metabolite]
-        
-        return round((value - mean)/sd, 2) if pd.notna(sd) and sd > 0 else np.nan
-    
-    # Обработка метаболитов
-    results = []
-    for metabolite in risk_params['Маркер / Соотношение']:
-        try:
-            value = metabolic_data.loc[0, metabolite]
-            
-            # Обработка некорректных значений
-            if pd.isna(value) or np.isinf(value):
-                results.append((np.nan, np.nan))
-                continue
-                
-            value = max(0, value)  # Отрицательные значения заменяем на 0
-            z_score = calculate_zscore(metabolite, value) if value >= 0 else np.nan
-            results.append((value, z_score))
-            
-        except KeyError:
-            results.append((np.nan, np.nan))
+    # z-скор, уровни риска и оценки подгрупп считаются матрично (пациенты x маркеры)
+    scores = score_markers(risk_params, metabolic_data.loc[[0]], ref_stats)
     
     # Добавляем результаты в датафрейм
     risk_params = risk_params.assign(
-        Patient=[r[0] for r in results],
-        Z_score=[r[1] for r in results]
+        Patient=scores['values'][0],
+        Z_score=scores['z_scores'][0]
     ).copy()
     
-    # Расчет групповых оценок
-    def calculate_subgroup_score(group):
-        """Рассчитывает оценку для подгруппы"""
-        inputs = []
-        for _, row in group.iterrows():
-            value = abs(row['Z_score']* row['веса'])
-            
-            risk = 0 if value < 1.54 else \
-                    1 if (1.54 <= value <= 1.96) else \
-                    2 if value > 1.96 else np.nan
-            if risk is np.nan:
-                print(row['Маркер / Соотношение'], row['Z_score'])
-                        
-            inputs.append(risk)
-        
-        max_score = len(group['веса']) * 2
-        return sum(inputs) / max_score * 100 if max_score > 0 else 0
-    
-    # Применяем расчет для каждой категории
-    subgroup_scores = {
-        cat: calculate_subgroup_score(group)
-        for cat, group in risk_params.groupby('Категория')
-    }
-    
     # Добавляем оценки подгрупп
-    risk_params['Subgroup_score'] = risk_params['Категория'].map(subgroup_scores)
+    risk_params['Subgroup_score'] = risk_params['Категория'].map(scores['subgroup'].iloc[0])
     
     return risk_params
+
+
+def prepare_final_dataframe_cohort(risk_params, metabolomic_data_with_ratios, ref_stats):
+    """
+    Рассчитывает итоговые датафреймы сразу для всех пациентов без промежуточных файлов
+    
+    Параметры:
+        risk_params - DataFrame листа Params_metaboscan
+        metabolomic_data_with_ratios - DataFrame с метаболитами и соотношениями (строка = пациент)
+        ref_stats - DataFrame листа Ref_stats или уже числовая таблица
+                    (ReferenceStore.ref_stats_table, индекс 'stat')
+        
+    Возвращает:
+        Длинный датафрейм: строки risk_params для каждого пациента и колонка patient_index
+    """
+    if ref_stats.index.name != 'stat':
+        ref_stats = ref_stats_table_from_frame(ref_stats)
+    return score_cohort(
+        risk_params,
+        metabolomic_data_with_ratios,
+        ref_stats,
+    )
     
-def probability_to_score(prob, threshold):
-    prob = min(max(prob, 0), 1)
-    if prob < threshold:
-        score = 4 * prob / threshold
-    else:
-        score = 4 + 4 * (prob - threshold) / (1 - threshold)
-    return 10- round(score, 0)
+# Векторизованная версия, общая с ML пайплайнами
+probability_to_score = BaseDiseasePipeline.probability_to_score
+
+
+def _ml_risk_error(disease_name, error):
+    """Result row for an ML group that could not be scored (a new dict every time)"""
+    return {
+        "Группа риска": disease_name,
+        "Риск-скор": None,
+        "Метод оценки": f"ML модель (ошибка: {str(error)})"
+    }
+
+
+def _ml_risk_row(pipeline, disease_name, row):
+    try:
+        return pipeline.calculate_risk(row)
+    except Exception as e:
+        print(f"Error processing {disease_name}: {str(e)}")
+        return _ml_risk_error(disease_name, e)
 
 
-from importlib import import_module
 def calculate_risks(risk_params_data, metabolic_data_with_ratios):
     """
     Расчет комбинированных рисков с использованием:
@@ -336,39 +193,38 @@ def calculate_risks(risk_params_data, metabolic_data_with_ratios):
     metabolic_data_with_ratios = metabolic_data_with_ratios[~metabolic_data_with_ratios.index.duplicated()]
     risk_params_data = risk_params_data[~risk_params_data.index.duplicated()]
     
-    # Define which diseases to process
-    disease_pipelines = {
-        "CVD": "CVD.pipeline.CVDPipeline",
-        "LIVER": "LIVER.pipeline.LIVERPipeline",
-        "PULMO": "PULMO.pipeline.PULMOPipeline",
-        "RA": "RA.pipeline.RAPipeline",
-        "ONCO": "ONCO.pipeline.ONCOPipeline",
-    }
-    
     results = []
     
-    # Process each row
-    for idx, row in metabolic_data_with_ratios.iterrows():
-        for disease_name, pipeline_path in disease_pipelines.items():
-            try:
-                # Dynamically import and instantiate the pipeline
-                module_path, class_name = pipeline_path.rsplit('.', 1)
-                module = import_module(f"models.{module_path}")
-                pipeline_class = getattr(module, class_name)
-                pipeline = pipeline_class()
-                
-                # Calculate risk
-                result = pipeline.calculate_risk(row)
-                results.append(result)
-                
-            except Exception as e:
-                print(f"Error processing {disease_name}: {str(e)}")
-                results.append({
-                    "Группа риска": disease_name,
-                    "Риск-скор": None,
-                    "Метод оценки": f"ML модель (ошибка: {str(e)})"
-                })
-       
+    # One batched call per pipeline for all rows
+    batch_results = {}
+    for disease_name in DISEASE_PIPELINES:
+        try:
+            # Shared instance, models are loaded once per process
+            pipeline = get_pipeline(disease_name)
+        except Exception as e:
+            print(f"Error processing {disease_name}: {str(e)}")
+            batch_results[disease_name] = [_ml_risk_error(disease_name, e) for _ in range(len(metabolic_data_with_ratios))]
+            continue
+
+        try:
+            batch_results[disease_name] = pipeline.calculate_risk_batch(
+                metabolic_data_with_ratios
+            ).to_dict('records')
+        except Exception as e:
+            # One bad row must not fail the whole cohort: score row by row
+            print(f"Error processing {disease_name} batch, falling back to rows: {str(e)}")
+            batch_results[disease_name] = [
+                _ml_risk_row(pipeline, disease_name, row) for _, row in metabolic_data_with_ratios.iterrows()
+            ]
+
+    # Keep row-major order (row by row, disease by disease)
+    for i in range(len(metabolic_data_with_ratios)):
+        for disease_name in DISEASE_PIPELINES:
+            results.append(batch_results[disease_name][i])
+
+    # Parameter-based groups below use the last patient row
+    if len(metabolic_data_with_ratios):
+        row = metabolic_data_with_ratios.iloc[-1]
 
     # 2. Process other groups with parameter-based method
     # Filter out ML-only groups
@@ -423,123 +279,9 @@ logging.basicConfig(
 )
 
 def setup_chrome_driver():
-    """Configure Chrome WebDriver with extended timeout settings"""
-    chrome_options = Options()
-    chrome_options.binary_location = "/usr/bin/chromium"
-    chrome_options.add_argument("--headless=new")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--disable-setuid-sandbox")
-    chrome_options.add_argument("--remote-debugging-port=9222")
-    
-    # Improved font configuration
-    chrome_options.add_argument("--disable-font-subpixel-positioning")
-    chrome_options.add_argument("--disable-remote-fonts")
-    chrome_options.add_argument("--force-color-profile=srgb")
-    
-    # Set default fonts
-    font_prefs = {
-        "webkit.webprefs.default_fixed_font_size": 13,
-        "webkit.webprefs.default_font_size": 16,
-        "webkit.webprefs.minimum_font_size": 12,
-        "webkit.webprefs.minimum_logical_font_size": 12,
-        "webkit.webprefs.default_font_family": "Calibri",
-        "webkit.webprefs.sansserif_font_family": "Calibri",
-        "webkit.webprefs.serif_font_family": "Times New Roman",
-        "webkit.webprefs.fixed_font_family": "Consolas"
-    }
-    chrome_options.add_experimental_option("prefs", font_prefs)
-    
-    # Установка совместимой версии ChromeDriver
-    try:
-        # Способ 1: Установить правильную версию через ChromeDriverManager
-        driver = webdriver.Chrome(
-            service=Service(
-                ChromeDriverManager(
-                    driver_version="139.0.7258*"  # Указываем нужную версию
-                ).install()
-            ),
-            options=chrome_options
-        )
-    except Exception as e:
-        print(f"Error with ChromeDriverManager: {e}")
-        try:
-            # Способ 2: Использовать системный chromedriver (должен быть совместимой версии)
-            service = Service("/usr/bin/chromedriver")
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-        except Exception as e2:
-            print(f"Error with system chromedriver: {e2}")
-            # Способ 3: Попробовать без указания service (автоопределение)
-            driver = webdriver.Chrome(options=chrome_options)
-    
-    driver.set_page_load_timeout(55)
-    driver.set_script_timeout(40)
-    return driver
-
-def is_dash_process(process):
-    """Check if process is our Dash application"""
-    try:
-        cmdline = ' '.join(process.cmdline()).lower()
-        return ('main.py' in cmdline or 'dash' in cmdline) and 'python' in process.name().lower()
-    except (psutil.NoSuchProcess, psutil.AccessDenied, AttributeError):
-        return False
-    
-
-
-def kill_dash_app(port=8050):
-    """Kill only the Dash app running on specified port"""
-    for proc in psutil.process_iter(['pid', 'name']):
-        try:
-            # Cross-platform way to check connections
-            connections = proc.net_connections()
-            for conn in connections:
-                if conn.laddr.port == port and is_dash_process(proc):
-                    try:
-                        proc.terminate()
-                        proc.wait(timeout=5)
-                    except (psutil.NoSuchProcess, psutil.TimeoutExpired):
-                        try:
-                            proc.kill()
-                        except:
-                            pass
-                    break
-        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.Error):
-            continue
-
-def wait_for_dash_app(timeout=45):
-    """Wait for Dash app to become ready with content verification"""
-    start_time = time.time()
-    
-    while time.time() - start_time < timeout:
-        try:
-            # First check if port is in use
-            port_in_use = False
-            for proc in psutil.process_iter(['pid']):
-                try:
-                    for conn in proc.connections():
-                        if conn.laddr.port == 8050:
-                            port_in_use = True
-                            break
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.Error):
-                    continue
-            
-            if not port_in_use:
-                time.sleep(2)
-                continue
-                
-            # Then check health endpoint
-            health_response = requests.get("http://localhost:8050/_alive", timeout=5)
-            if health_response.status_code == 200:
-                content_response = requests.get("http://localhost:8050", timeout=10)
-                if "Patient Report" in content_response.text:
-                    return True
-        except requests.exceptions.RequestException:
-            time.sleep(3)
-    
-    return False
-
+    """Standalone Chrome WebDriver (offline chromedriver lookup, own debugging port).
+    Reports use the shared pool from browser_pool.get_browser_pool instead."""
+    return create_chrome_driver()
 
 def log_errors(process):
     """Log any errors from the subprocess"""
@@ -562,17 +304,6 @@ def cleanup_resources(driver, process):
         except:
             pass
     
-    # Then terminate process
-    if process:
-        try:
-            process.terminate()
-            try:
-                process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                process.kill()
-        except:
-            pass
-    
-    # Final check to ensure Dash is gone
-    kill_dash_app(8050)
+    # Then terminate process (only the one we started)
+    stop_dash_process(process)
 
@@ -0,0 +1,32 @@
+import importlib.util
+import os
+import threading
+
+BROWSER_POOL_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'browser_pool.py')
+
+
+def fresh_browser_pool_module():
+    """browser_pool loaded anew, with no pool and no warm-up thread yet"""
+    spec = importlib.util.spec_from_file_location('browser_pool_fresh', BROWSER_POOL_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_warm_up_in_background_returns(monkeypatch):
+    browser_pool = fresh_browser_pool_module()
+    warmed = threading.Event()
+    # No Chrome here: warm-up only records that it ran
+    monkeypatch.setattr(browser_pool.BrowserPool, 'warm_up', lambda self: warmed.set())
+
+    result = {}
+    caller = threading.Thread(target=lambda: result.update(thread=browser_pool.warm_up_in_background()),
+                              daemon=True)
+    caller.start()
+    caller.join(timeout=10)
+
+    assert not caller.is_alive(), "warm_up_in_background did not return (deadlock on _pool_lock)"
+    result['thread'].join(timeout=10)
+    assert warmed.is_set()
+    # Later calls reuse the same thread and pool
+    assert browser_pool.warm_up_in_background() is result['thread']
@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit_utilit
+
+
+class RowOnlyPipeline:
+    """Batch scoring fails as a whole, rows score one by one; the row with text fails"""
+
+    def calculate_risk_batch(self, data):
+        raise ValueError("batch failed")
+
+    def calculate_risk(self, row):
+        return {"Группа риска": "TEST", "Риск-скор": float(row['Marker']) * 2, "Метод оценки": "ML модель"}
+
+
+def test_batch_failure_falls_back_to_rows(monkeypatch):
+    monkeypatch.setattr(streamlit_utilit, 'DISEASE_PIPELINES', {'TEST': None})
+    monkeypatch.setattr(streamlit_utilit, 'get_pipeline', lambda name: RowOnlyPipeline())
+
+    metabolic_data = pd.DataFrame({'Marker': [1.0, 'n/a', 3.0]})
+    # Only ML-scored groups, so no parameter-based rows are added
+    risk_params = pd.DataFrame({'Группа_риска': ['Состояние функции печени'],
+                                'Маркер / Соотношение': ['Marker'], 'Subgroup_score': [0]})
+
+    result = streamlit_utilit.calculate_risks(risk_params, metabolic_data)
+
+    assert result['Риск-скор'].tolist()[0] == 2.0
+    assert pd.isna(result['Риск-скор'].tolist()[1])
+    assert result['Риск-скор'].tolist()[2] == 6.0
+    assert result['Метод оценки'].str.contains('ошибка').tolist() == [False, True, False]
+
+
+def test_error_rows_are_separate_dicts(monkeypatch):
+    def broken_pipeline(name):
+        raise RuntimeError("model not found")
+
+    monkeypatch.setattr(streamlit_utilit, 'DISEASE_PIPELINES', {'TEST': None})
+    monkeypatch.setattr(streamlit_utilit, 'get_pipeline', broken_pipeline)
+    captured = {}
+    original = pd.DataFrame
+
+    def capture(data=None, *args, **kwargs):
+        if isinstance(data, list) and data and isinstance(data[0], dict):
+            captured['rows'] = data
+        return original(data, *args, **kwargs)
+
+    monkeypatch.setattr(streamlit_utilit.pd, 'DataFrame', capture)
+    risk_params = original({'Группа_риска': ['Состояние функции печени'],
+                            'Маркер / Соотношение': ['Marker'], 'Subgroup_score': [0]})
+
+    streamlit_utilit.calculate_risks(risk_params, original({'Marker': [1.0, 2.0]}))
+
+    rows = captured['rows']
+    assert len(rows) == 2 and rows[0] == rows[1] and rows[0] is not rows[1]
@@ -0,0 +1,53 @@
+"""
+Corridor plots drawn in the warmed process pool must be the same images
+as the ones drawn serially in the current process.
+"""
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_builder import build_report_layout
+from ui_kit import plot_cache, plot_pool
+from ui_kit.static_html import StaticAssets, component_to_html
+
+from test_report_parity import report_tables
+
+
+def corridor_plot_uris(tmp_dir):
+    """Data URIs of the basic report, drawn with an empty plot cache"""
+    plot_cache._plot_cache = plot_cache.PlotCache(str(tmp_dir))
+    patient_info = {'name': 'Тест', 'age': 40, 'gender': 'М', 'date': '01.01.2026', 'layout': 'basic'}
+    page = component_to_html(build_report_layout(patient_info, report_tables(), StaticAssets()))[0]
+    return re.findall(r'data:image/[^"\')]+', page)
+
+
+def test_pool_renders_same_plots_as_serial(tmp_path, monkeypatch):
+    monkeypatch.setattr(plot_cache, '_plot_cache', None)
+    monkeypatch.setattr(plot_pool, 'PLOT_WORKERS', 2)
+    monkeypatch.setattr(plot_pool, '_warmed_up', False)
+    monkeypatch.setattr(plot_pool, '_executor', None)
+
+    pool_batches = []
+    get_executor = plot_pool.get_plot_executor
+
+    def counting_executor():
+        pool_batches.append(1)
+        return get_executor()
+
+    monkeypatch.setattr(plot_pool, 'get_plot_executor', counting_executor)
+
+    serial = corridor_plot_uris(tmp_path / 'serial')
+    assert not pool_batches, "pool used before warm_up_plot_workers"
+
+    try:
+        plot_pool.warm_up_plot_workers()
+        pooled = corridor_plot_uris(tmp_path / 'pooled')
+        assert len(pool_batches) == 2  # warm-up, then the corridor plot batch
+        assert plot_pool._executor is not None, "pool broke, plots were drawn by the serial fallback"
+    finally:
+        plot_pool.shutdown_plot_executor()
+
+    assert len(serial) > 12
+    assert pooled == serial
@@ -0,0 +1,72 @@
+"""
+Static (in-memory tables) and Dash/server (tables through a JSON report bundle)
+rendering must produce the same report.
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_builder import build_report_layout
+from report_bundle import report_bundle_from_dict, report_bundle_to_dict
+from risk_scoring import ref_stats_table_from_frame, score_cohort
+from ui_kit import plot_cache, plot_pool
+from ui_kit.static_html import StaticAssets, component_to_html
+
+REF_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Ref.xlsx')
+
+
+def report_tables():
+    """Tables as Streamlit passes them to generate_pdf_report (scores are whole-number floats)"""
+    sheets = pd.read_excel(REF_FILE, sheet_name=None)
+    ref_sheet = sheets['Ref_stats']
+    ref_table = ref_stats_table_from_frame(ref_sheet)
+
+    metabolomic_data = pd.concat([
+        pd.DataFrame({'Код': ['TEST001'], 'Группа': ['Control']}),
+        pd.DataFrame([ref_table.loc['mean'].to_numpy() * 1.3], columns=ref_table.columns),
+    ], axis=1)
+
+    risk_params = sheets['Params_metaboscan']
+    risk_params_exp = score_cohort(risk_params, metabolomic_data, ref_table).drop(columns='patient_index')
+
+    groups = list(risk_params['Группа_риска'].unique()) + sheets['metrics_ml_models']['group_name'].tolist()
+    risk_scores = pd.DataFrame({
+        'Группа риска': groups,
+        'Риск-скор': np.round(np.linspace(3, 10, len(groups)), 0),
+        'Метод оценки': 'Параметры',
+    })
+
+    return {
+        'risk_scores': risk_scores,
+        'risk_params': risk_params_exp,
+        'metabolomic_data': metabolomic_data,
+        'ref_stats': ref_sheet,
+        'metrics': sheets['metrics_ml_models'],
+    }
+
+
+def render_text(patient_info, tables):
+    return component_to_html(build_report_layout(patient_info, tables, StaticAssets()))[0]
+
+
+@pytest.mark.parametrize('layout', ['basic', 'recommendation'])
+def test_static_and_bundle_render_same_report(layout, tmp_path, monkeypatch):
+    monkeypatch.setattr(plot_pool, 'PLOT_WORKERS', 1)
+    monkeypatch.setattr(plot_cache, '_plot_cache', plot_cache.PlotCache(str(tmp_path / 'plots')))
+
+    patient_info = {'name': 'Тест', 'age': 40, 'gender': 'М', 'date': '01.01.2026', 'layout': layout}
+    tables = report_tables()
+
+    bundle = json.loads(json.dumps(report_bundle_to_dict(patient_info, tables), ensure_ascii=False, default=str))
+    static_html = render_text(patient_info, tables)
+    bundle_html = render_text(*report_bundle_from_dict(bundle))
+
+    assert static_html == bundle_html
+    assert tables['risk_scores']['Риск-скор'].dtype == float  # caller's table is not modified
+    assert '.0 из 10' not in static_html
@@ -0,0 +1,40 @@
+"""
+markdown_to_html must render report messages the way dcc.Markdown (CommonMark) does.
+Expected HTML is the CommonMark reference output (whitespace between blocks aside).
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ui_kit.static_html import markdown_to_html
+
+COMMONMARK_CASES = [
+    # List right after a text line, no blank line between
+    ('Рекомендации:\n- пить воду\n- спать',
+     '<p>Рекомендации:</p><ul><li>пить воду</li><li>спать</li></ul>'),
+    ('План:\n1. анализы\n2. контроль',
+     '<p>План:</p><ol><li>анализы</li><li>контроль</li></ol>'),
+    # Only a list starting at 1 interrupts a paragraph
+    ('Пункт\n2. не список', '<p>Пункт\n2. не список</p>'),
+    # Header followed by text on the next line
+    ('# Итог\nвсё хорошо', '<h1>Итог</h1><p>всё хорошо</p>'),
+    ('## Питание ##\nбольше овощей', '<h2>Питание</h2><p>больше овощей</p>'),
+    ('Итог\n===\nтекст', '<h1>Итог</h1><p>текст</p>'),
+    ('Абзац один\nпродолжение\n\nАбзац два', '<p>Абзац один\nпродолжение</p><p>Абзац два</p>'),
+    ('- первый\nпродолжение\n- второй', '<ul><li>первый\nпродолжение</li><li>второй</li></ul>'),
+    ('- первый\n\n- второй', '<ul><li><p>первый</p></li><li><p>второй</p></li></ul>'),
+    ('- пункт\n\nПосле списка', '<ul><li>пункт</li></ul><p>После списка</p>'),
+    ('- один\n* другой список', '<ul><li>один</li></ul><ul><li>другой список</li></ul>'),
+    ('3) три\n4) четыре', '<ol start="3"><li>три</li><li>четыре</li></ol>'),
+    ('Текст\n\n***\n\nЕще', '<p>Текст</p><hr><p>Еще</p>'),
+    ('**Важно:** *ежедневно*  \nпо утрам',
+     '<p><strong>Важно:</strong> <em>ежедневно</em><br>\nпо утрам</p>'),
+]
+
+
+@pytest.mark.parametrize('text, expected', COMMONMARK_CASES)
+def test_markdown_matches_commonmark(text, expected):
+    assert markdown_to_html(text).replace('>\n<', '><') == expected
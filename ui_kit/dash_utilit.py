@@ -5,11 +5,27 @@ import matplotlib as mpl
 import numpy as np
 import os
 import base64
+from functools import lru_cache
 from io import BytesIO
 
+from ui_kit.plot_cache import get_plot_cache, plot_cache_key
+
 # Get the directory where your script is located
 base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Bump when the drawing of a cached chart changes, old cache entries are then never hit
+Z_SCORE_PLOT_VERSION = 1
+NORMAL_DIST_VERSION = 1
+
+# Chart output: raster PNG or vector SVG (smaller page and PDF, no rasterization)
+PLOT_FORMATS = ('png', 'svg')
+PLOT_MIME_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+# Text is written as glyph outlines, so the SVG does not depend on fonts installed
+# where it is viewed (only the glyphs used are embedded); fixed hash salt and
+# no date keep the output byte-identical for the same figure
+SVG_RC_PARAMS = {'svg.fonttype': 'path', 'svg.hashsalt': 'metaboscan'}
+
 
 def smart_round(value, default_decimals=0, ref_stats_entry=None):
     """
@@ -28,42 +44,14 @@ def smart_round(value, default_decimals=0, ref_stats_entry=None):
     if num == 0:
         return 0.0
 
-    decimals = default_decimals
+    # Precision of the norm bounds, parsed once per metabolite
+    norm = entry_norm(ref_stats_entry)
+    decimals = max(norm.decimals, default_decimals) if norm is not None else default_decimals
+    return round_nonzero(num, decimals)
 
-    if ref_stats_entry and isinstance(ref_stats_entry, dict) and 'norm' in ref_stats_entry:
-        norm_str = ref_stats_entry['norm']
-        
-        # Parse norm string into min and max values
-        min_val = max_val = None
-        if ' - ' in norm_str:
-            parts = norm_str.split(' - ', 1)
-            try:
-                min_val, max_val = float(parts[0].strip()), float(parts[1].strip())
-            except ValueError:
-                pass
-        elif norm_str.startswith(('<', '>')):
-            try:
-                val = float(norm_str[1:].strip())
-                if norm_str.startswith('<'):
-                    min_val, max_val = 0.0, val
-                else:
-                    min_val, max_val = val, None
-            except ValueError:
-                pass
-
-        # Count decimal places in a number
-        def count_decimals(x):
-            if x is None:
-                return 0
-            s = f"{x:.5f}".rstrip('0').rstrip('.')
-            return len(s.split('.')[1]) if '.' in s else 0
-
-        decimals = max(
-            count_decimals(min_val),
-            count_decimals(max_val),
-            default_decimals
-        )
 
+def round_nonzero(num, decimals):
+    """round(num, decimals), with more decimals (up to 10) if that would give 0"""
     # First rounding attempt
     rounded = round(num, decimals)
 
@@ -81,71 +69,222 @@ def smart_round(value, default_decimals=0, ref_stats_entry=None):
 
     return round(num, 10)
 
-def create_ref_stats_from_excel(excel_path):
-    # Read Excel with explicit handling of decimal commas
-    df = pd.read_excel(excel_path)
+def count_decimals(x):
+    """Decimal places in a number, up to 5 (None has none)"""
+    if x is None:
+        return 0
+    s = f"{x:.5f}".rstrip('0').rstrip('.')
+    return len(s.split('.')[1]) if '.' in s else 0
 
-    # Transpose to metabolites-as-rows format
-    df = df.set_index('metabolite').T.reset_index()
-    df.columns.name = None
 
-    ref_stats = {}
+def format_number(value):
+    """Format number to remove .0 for integers"""
+    try:
+        num = float(value)
+        if num.is_integer():
+            return int(num)
+        return num
+    except (ValueError, TypeError):
+        return value
 
-    def format_number(value):
-        """Format number to remove .0 for integers"""
-        try:
-            num = float(value)
-            if num.is_integer():
-                return int(num)
-            return num
-        except (ValueError, TypeError):
-            return value
-
-    for _, row in df.iterrows():
-        try:
-            metabolite = row['index']
-            data = {
-                'mean': float(str(row['mean']).replace(',', '.')),
-                'sd': float(str(row['sd']).replace(',', '.')),
-                'ref_min': (
-                    float(str(row['ref_min']).replace(',', '.'))
-                    if pd.notna(row['ref_min'])
-                    else None
-                ),
-                'ref_max': (
-                    float(str(row['ref_max']).replace(',', '.'))
-                    if pd.notna(row['ref_max'])
-                    else None
-                ),
-                'name_view': row['name_view'],
-                'name_short_view': row['name_short_view']
-            }
 
-            # Generate norm string with clean formatting
-            if data['ref_min'] is not None and data['ref_max'] is not None:
-                min_val = format_number(data['ref_min'])
-                max_val = format_number(data['ref_max'])
-                
-                if min_val == 0:
-                    data['norm'] = f"< {max_val}"
-                else:
-                    data['norm'] = f"{min_val} - {max_val}"
+class Norm:
+    """
+    Reference range parsed from a norm string: "0.01 - 0.05", "< 0.04" or "> 5".
 
-            ref_stats[metabolite] = {k: v for k, v in data.items() if v is not None}
+    min, max           - bounds; "< x" counts from 0, max is None for "> x"
+    open_min, open_max - the range has no lower / upper limit (written as "< x" / "> x")
+    decimals           - display precision of the bounds
+    text               - the norm string
+    """
+
+    __slots__ = ('min', 'max', 'open_min', 'open_max', 'decimals', 'text')
+
+    def __init__(self, text, min_value, max_value, open_min=False, open_max=False):
+        self.text = text
+        self.min = min_value
+        self.max = max_value
+        self.open_min = open_min
+        self.open_max = open_max
+        self.decimals = max(count_decimals(min_value), count_decimals(max_value))
+
+    def status(self, value):
+        """-1 below the range, 1 above, 0 within"""
+        if self.min is not None and value < self.min:
+            return -1
+        if self.max is not None and value > self.max:
+            return 1
+        return 0
+
+    def __repr__(self):
+        return f"Norm({self.text!r})"
+
+
+@lru_cache(maxsize=1024)
+def parse_norm(text):
+    """Norm for a norm string, None if it is not in a known format"""
+    if not isinstance(text, str):
+        return None
+    try:
+        if ' - ' in text:
+            min_text, max_text = text.split(' - ', 1)
+            return Norm(text, float(min_text.strip()), float(max_text.strip()))
+        if text.startswith('<'):
+            return Norm(text, 0.0, float(text[1:].strip()), open_min=True)
+        if text.startswith('>'):
+            return Norm(text, float(text[1:].strip()), None, open_max=True)
+    except ValueError:
+        pass
+    return None
+
+
+def as_norm(norm):
+    """Norm from a Norm or a norm string"""
+    return norm if isinstance(norm, Norm) else parse_norm(norm)
+
+
+def entry_norm(ref_stats_entry):
+    """Norm of a ref_stats entry (parsed when ref_stats was built), None without a usable one"""
+    if isinstance(ref_stats_entry, RefStatsEntry):
+        return ref_stats_entry.norm_range
+    if ref_stats_entry and isinstance(ref_stats_entry, dict) and 'norm' in ref_stats_entry:
+        return parse_norm(ref_stats_entry['norm'])
+    return None
 
-        except Exception as e:
-            print(f"Error processing {row.get('index', 'unknown')}: {str(e)}")
-            continue
-    return ref_stats
 
-def plot_metabolite_z_scores(metabolite_concentrations, group_title, norm_ref=[-1.54, 1.54], ref_stats={}):
+class RefStatsEntry(dict):
     """
-    Combined function that processes data like the second function
-    but renders the plot like the first function
+    One metabolite of ref_stats: the usual dict ('mean', 'sd', 'ref_min', 'ref_max',
+    'name_view', 'name_short_view', 'norm') plus values parsed when it was built.
+
+    norm_range - Norm parsed from 'norm', None without a norm
     """
-    # Set font to Calibri
-    mpl.rcParams['font.family'] = 'Calibri'
 
+    __slots__ = ('norm_range',)
+
+    def __init__(self, data, norm_range=None):
+        super().__init__(data)
+        self.norm_range = norm_range
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self), self.norm_range))
+
+
+# Columns of the transposed Ref_stats sheet
+REF_STATS_NUMBERS = ('mean', 'sd', 'ref_min', 'ref_max')
+REF_STATS_NAMES = ('name_view', 'name_short_view')
+
+
+def _parse_decimal(text):
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def _parse_decimal_column(values):
+    """Column with numbers or strings with decimal commas -> (float64 array, unparseable mask)"""
+    missing = values.isna().to_numpy()
+    text = values.astype(str).str.replace(',', '.', regex=False).to_numpy()
+    text[missing] = 'nan'
+    try:
+        # str() of a float parses back to the same float
+        return text.astype(np.float64), np.zeros(len(text), dtype=bool)
+    except ValueError:
+        numbers = np.array([_parse_decimal(t) for t in text], dtype=np.float64)
+        return numbers, np.isnan(numbers) & ~missing
+
+
+class RefStatsArrays:
+    """
+    Ref_stats sheet parsed column-wise.
+
+    metabolites                   - Index, order of all arrays
+    mean, sd, ref_min, ref_max    - float64 arrays, NaN where not set
+    name_view, name_short_view    - object arrays
+    norm                          - display string of the range ("0.01 - 0.05", "< 0.04") or None
+    norm_ranges                   - the same range as Norm, or None
+    decimals                      - display precision of the range, -1 without a norm
+    """
+
+    def __init__(self, df):
+        # Transpose to metabolites-as-rows format
+        df = df.set_index('metabolite').T
+        missing = [col for col in REF_STATS_NUMBERS + REF_STATS_NAMES if col not in df.columns]
+        if missing:
+            print(f"Error processing ref stats: missing rows {', '.join(missing)}")
+            df = pd.DataFrame(columns=REF_STATS_NUMBERS + REF_STATS_NAMES, dtype=object)
+
+        parsed = {}
+        bad = np.zeros(len(df), dtype=bool)
+        for col in REF_STATS_NUMBERS:
+            parsed[col], col_bad = _parse_decimal_column(df[col])
+            bad |= col_bad
+        for metabolite in df.index[bad]:
+            print(f"Error processing {metabolite}: non-numeric reference value")
+
+        keep = ~bad
+        self.metabolites = df.index[keep]
+        self.mean = parsed['mean'][keep]
+        self.sd = parsed['sd'][keep]
+        self.ref_min = parsed['ref_min'][keep]
+        self.ref_max = parsed['ref_max'][keep]
+        self.name_view = df['name_view'].to_numpy(dtype=object)[keep]
+        self.name_short_view = df['name_short_view'].to_numpy(dtype=object)[keep]
+
+        has_norm = ~(np.isnan(self.ref_min) | np.isnan(self.ref_max))
+        self.norm = np.full(len(self.metabolites), None, dtype=object)
+        self.norm_ranges = np.full(len(self.metabolites), None, dtype=object)
+        self.decimals = np.full(len(self.metabolites), -1, dtype=np.int64)
+        for i in np.flatnonzero(has_norm):
+            ref_min, ref_max = float(self.ref_min[i]), float(self.ref_max[i])
+            min_val = format_number(ref_min)
+            max_val = format_number(ref_max)
+            # Generate norm string with clean formatting
+            if min_val == 0:
+                norm = Norm(f"< {max_val}", 0.0, ref_max, open_min=True)
+            else:
+                norm = Norm(f"{min_val} - {max_val}", ref_min, ref_max)
+            self.norm[i] = norm.text
+            self.norm_ranges[i] = norm
+            self.decimals[i] = norm.decimals
+
+    def __len__(self):
+        return len(self.metabolites)
+
+    def entry(self, i):
+        """RefStatsEntry of the i-th metabolite"""
+        data = {'mean': float(self.mean[i]), 'sd': float(self.sd[i])}
+        if not np.isnan(self.ref_min[i]):
+            data['ref_min'] = float(self.ref_min[i])
+        if not np.isnan(self.ref_max[i]):
+            data['ref_max'] = float(self.ref_max[i])
+        for key, value in (('name_view', self.name_view[i]), ('name_short_view', self.name_short_view[i]),
+                           ('norm', self.norm[i])):
+            if value is not None:
+                data[key] = value
+        return RefStatsEntry(data, self.norm_ranges[i])
+
+    def entries(self):
+        """{metabolite: RefStatsEntry} - the dict view used by the layouts"""
+        return {metabolite: self.entry(i) for i, metabolite in enumerate(self.metabolites)}
+
+
+def create_ref_stats_from_excel(excel_path):
+    # Read Excel with explicit handling of decimal commas
+    return create_ref_stats_from_frame(pd.read_excel(excel_path))
+
+
+def create_ref_stats_from_frame(df):
+    """Build ref_stats dict from Ref_stats sheet already loaded as DataFrame"""
+    return RefStatsArrays(df).entries()
+
+def z_score_plot_data(metabolite_concentrations, ref_stats):
+    """
+    Z-scores and bar colors for the corridor plot.
+
+    Returns (data, highlight_green_metabolites) - everything the drawing depends on.
+    """
     # Calculate z-scores and determine colors (from second function)
     data = []
     highlight_green_metabolites = []
@@ -174,10 +313,10 @@ def plot_metabolite_z_scores(metabolite_concentrations, group_title, norm_ref=[-
             z_score = round((conc - ref_data["mean"]) / ref_data["sd"], 2)
 
             # Handle special case for "<" reference ranges
-            if "norm" in ref_data and isinstance(ref_data["norm"], str):
-                if "<" in ref_data["norm"] and z_score <= 0:
-                    z_score = 0
-                    highlight_green_metabolites.append(display_name)
+            norm = entry_norm(ref_data)
+            if norm is not None and norm.open_min and z_score <= 0:
+                z_score = 0
+                highlight_green_metabolites.append(display_name)
 
             # Determine color based on z-score
             if abs(z_score) > 1.96:  # Significant deviation
@@ -200,6 +339,37 @@ def plot_metabolite_z_scores(metabolite_concentrations, group_title, norm_ref=[-
         except (TypeError, ValueError):
             missing_metabolites.append(original_name)
 
+    return data, highlight_green_metabolites
+
+
+def z_score_plot_key(data, highlight_green_metabolites, norm_ref, fmt='png'):
+    """Cache key: the picture depends only on names, rounded z-scores and colors"""
+    bars = [(d["name_short_view"], float(d["z_score"]), d["color"]) for d in data]
+    return plot_cache_key(Z_SCORE_PLOT_VERSION, fmt, bars, sorted(highlight_green_metabolites), list(norm_ref))
+
+
+def plot_metabolite_z_scores(metabolite_concentrations, group_title, norm_ref=[-1.54, 1.54], ref_stats={},
+                             fmt='png'):
+    """
+    Combined function that processes data like the second function
+    but renders the plot like the first function.
+    Identical plots are served from the disk cache.
+    """
+    data, highlight_green_metabolites = z_score_plot_data(metabolite_concentrations, ref_stats)
+    cache = get_plot_cache()
+    key = z_score_plot_key(data, highlight_green_metabolites, norm_ref, fmt)
+    uri = cache.get(key)
+    if uri is None:
+        uri = draw_metabolite_z_scores(data, highlight_green_metabolites, norm_ref, fmt)
+        cache.put(key, uri)
+    return uri
+
+
+def draw_metabolite_z_scores(data, highlight_green_metabolites, norm_ref=[-1.54, 1.54], fmt='png'):
+    """Render corridor plot from z_score_plot_data output, returns PNG or SVG data URI"""
+    # Set font to Calibri
+    mpl.rcParams['font.family'] = 'Calibri'
+
     # Create figure - show empty plot if no valid data (from first function)
     fig, ax = plt.subplots(figsize=(12, 3), dpi=300)
     
@@ -219,7 +389,7 @@ def plot_metabolite_z_scores(metabolite_concentrations, group_title, norm_ref=[-
         ax.set_xticks([])
         ax.set_yticks([])
         plt.tight_layout()
-        return fig_to_uri(fig)
+        return fig_to_uri(fig, fmt)
 
     # Set y-axis limits to ±3 (from first function)
     ax.set_ylim(-3, 3)
@@ -443,16 +613,55 @@ def plot_metabolite_z_scores(metabolite_concentrations, group_title, norm_ref=[-
     
 
     plt.tight_layout(pad=0.0)
-    return fig_to_uri(fig)
+    return fig_to_uri(fig, fmt)
+
+def save_figure(fig, target, fmt='png', dpi=300, **kwargs):
+    """
+    fig.savefig in one of PLOT_FORMATS (target is a path or a file object).
+    dpi only matters for PNG, SVG is written as vectors.
+    """
+    if fmt not in PLOT_FORMATS:
+        raise ValueError(f"Unknown plot format: {fmt}")
+    if fmt == 'svg':
+        with mpl.rc_context(SVG_RC_PARAMS):
+            fig.savefig(target, format='svg', metadata={'Date': None}, **kwargs)
+    else:
+        fig.savefig(target, format='png', dpi=dpi, **kwargs)
 
-def fig_to_uri(fig):
-    """Convert matplotlib figure to data URI"""
+def fig_to_uri(fig, fmt='png', dpi=300, **kwargs):
+    """Convert matplotlib figure to data URI (kwargs go to savefig, default bbox_inches='tight')"""
+    kwargs.setdefault('bbox_inches', 'tight')
     buf = BytesIO()
-    fig.savefig(buf, format="png", dpi=300, bbox_inches='tight')
+    save_figure(fig, buf, fmt, dpi=dpi, **kwargs)
     buf.seek(0)
     img = base64.b64encode(buf.getvalue()).decode("ascii")
     plt.close(fig)
-    return f"data:image/png;base64,{img}"
+    return f"data:{PLOT_MIME_TYPES[fmt]};base64,{img}"
+
+
+def parse_metabolite_row(headers, values):
+    """
+    Build {metabolite: concentration} from header and value sequences.
+    The first column is the sample name and is skipped.
+    """
+    metabolite_data = {}
+
+    for col_idx in range(1, len(headers)):
+        metabolite_name = str(headers[col_idx]).replace(' Results', '').strip()
+        if pd.isna(metabolite_name):
+            continue
+
+        conc_value = values[col_idx]
+        try:
+            if isinstance(conc_value, str):
+                conc_value = float(conc_value.replace(',', '.'))
+            elif pd.isna(conc_value):
+                conc_value = 0.0
+            metabolite_data[metabolite_name] = conc_value
+        except:
+            metabolite_data[metabolite_name] = 0.0
+
+    return metabolite_data
 
 
 def safe_parse_metabolite_data(file_path):
@@ -464,75 +673,51 @@ def safe_parse_metabolite_data(file_path):
     try:
         # here excel file is first column name of sample and next columns are metabolites with conc below
         df = pd.read_excel(file_path, header=None)
-        metabolite_headers = df.iloc[0]
-        metabolite_data = {}
-
-        for col_idx in range(1, len(metabolite_headers)):
-            metabolite_name = str(metabolite_headers[col_idx]).replace(' Results', '').strip()
-            if pd.isna(metabolite_name):
-                continue
-
-            conc_value = df.iloc[1, col_idx]
-            try:
-                if isinstance(conc_value, str):
-                    conc_value = float(conc_value.replace(',', '.'))
-                elif pd.isna(conc_value):
-                    conc_value = 0.0
-                metabolite_data[metabolite_name] = conc_value
-            except:
-                metabolite_data[metabolite_name] = 0.0
-
-        return metabolite_data
+        return parse_metabolite_row(df.iloc[0], df.iloc[1])
     except Exception as e:
         print(f"Error processing file {file_path}: {str(e)}")
         return {}
 
 
-def get_status_color(value, norm_str):
+def metabolite_data_from_frame(df):
+    """Same as safe_parse_metabolite_data, for the first row of an in-memory DataFrame"""
     try:
-        norm_min = 0
-        norm_max = 0
-        if norm_str.__contains__(' - '):
-            norm_min, norm_max = map(float, norm_str.split(' - '))
-        elif norm_str.startswith('< '):
-            norm_max = float(norm_str.split('< ')[1])
-            norm_min = 0
-
-        if value < norm_min:
-            return "blue"  # Below normal range
-        elif value > norm_max:
-            return "red"  # Above normal range
-        else:
-            return "green"  # Within normal range
+        return parse_metabolite_row(list(df.columns), df.iloc[0].tolist())
+    except Exception as e:
+        print(f"Error processing metabolite data: {str(e)}")
+        return {}
+
 
-    except (ValueError, AttributeError):
-        # Handle cases where norm_str is not in expected format
+def get_status_color(value, norm):
+    """Status color of value for a norm (Norm or norm string)"""
+    norm = as_norm(norm)
+    if norm is None:
+        # Handle cases where norm is not in expected format
         return "gray"  # Default color for invalid format
 
+    status = norm.status(value)
+    if status < 0:
+        return "blue"  # Below normal range
+    elif status > 0:
+        return "red"  # Above normal range
+    else:
+        return "green"  # Within normal range
 
-def get_status_text(value, norm_str):
-    try:
-        norm_min = 0
-        norm_max = 0
-        if norm_str.__contains__(' - '):
-            norm_min, norm_max = map(float, norm_str.split(' - '))
-        elif norm_str.startswith('< '):
-            norm_max = float(norm_str.split('< ')[1])
-            norm_min = 0
-
-        if value < norm_min:
-            return "Снижен"  # Below normal range
-        elif value > norm_max:
-            return "Повышен"  # Above normal range
-        else:
-            return "Норма"  # Within normal range
 
-    except (ValueError, AttributeError):
-        # Handle cases where norm_str is not in expected format
+def get_status_text(value, norm):
+    """Status text of value for a norm (Norm or norm string)"""
+    norm = as_norm(norm)
+    if norm is None:
+        # Handle cases where norm is not in expected format
         return "Не определено"  # Default text for invalid format
 
-
-
+    status = norm.status(value)
+    if status < 0:
+        return "Снижен"  # Below normal range
+    elif status > 0:
+        return "Повышен"  # Above normal range
+    else:
+        return "Норма"  # Within normal range
 
 
 def get_color_age(n):
@@ -582,6 +767,9 @@ def get_color_age_border(n):
 
 
 def get_ref_min_max(ref_stats_entry):
+    norm = ref_stats_entry.norm_range if isinstance(ref_stats_entry, RefStatsEntry) else None
+    if norm is not None:
+        return norm.min, norm.max
     ref_min = ref_stats_entry["ref_min"]
     ref_max = ref_stats_entry["ref_max"]
     return ref_min, ref_max
@@ -636,7 +824,7 @@ import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 
-def normal_dist(N: int, a: float, value: float) -> str:
+def normal_dist(N: int, a: float, value: float, fmt: str = 'png') -> str:
     """
     Generate a colored normal distribution curve with a vertical line at the specified percentage value.
     
@@ -644,10 +832,24 @@ def normal_dist(N: int, a: float, value: float) -> str:
         N: Number of points in the distribution
         a: Range of the distribution (-a to a)
         value: Position to mark (0-100 scale)
+        fmt: Image format, one of PLOT_FORMATS
         
     Returns:
-        str: Path to the saved image
+        str: Data URI of the image (nothing is written to disk, so reports can be drawn concurrently)
     """
+    # The picture depends only on these arguments (value takes few distinct values),
+    # so every bell is drawn once and then served from the plot cache
+    cache = get_plot_cache()
+    key = plot_cache_key('normal_dist', NORMAL_DIST_VERSION, N, a, float(value), fmt)
+    uri = cache.get(key)
+    if uri is None:
+        uri = draw_normal_dist(N, a, value, fmt)
+        cache.put(key, uri)
+    return uri
+
+
+def draw_normal_dist(N: int, a: float, value: float, fmt: str = 'png') -> str:
+    """normal_dist without the cache"""
     # Generate normal distribution data
     x = np.linspace(-a, a, N)
     y = (1 / np.sqrt(2 * np.pi)) * np.exp(-0.5 * x**2)
@@ -687,16 +889,18 @@ def normal_dist(N: int, a: float, value: float) -> str:
         N=len(color_spectrum)
     )
     
-    # Fill the distribution with gradient colors
-    for i in range(N - 1):
-        # Normalize position to [0,1] for colormap
-        norm_pos = (x[i] + a) / (2 * a)
-        ax.fill_between(
-            [x[i], x[i + 1]], 
-            [0, 0], 
-            [y[i], y[i + 1]], 
-            color=cmap(norm_pos)
-        )
+    # Fill the distribution with gradient colors: a quad under every segment of the
+    # curve, colored by its left edge, all drawn as one collection
+    norm_pos = (x[:-1] + a) / (2 * a)  # Normalize position to [0,1] for colormap
+    zeros = np.zeros(N - 1)
+    quads = np.stack([
+        np.column_stack([x[:-1], y[:-1]]),
+        np.column_stack([x[:-1], zeros]),
+        np.column_stack([x[1:], zeros]),
+        np.column_stack([x[1:], y[1:]]),
+    ], axis=1)
+    colors = cmap(norm_pos)
+    ax.add_collection(mpl.collections.PolyCollection(quads, facecolors=colors, edgecolors=colors))
     
     # Add the distribution line
     ax.plot(x, y, color='#666666', linewidth=1.2, alpha=0.8)
@@ -716,19 +920,15 @@ def normal_dist(N: int, a: float, value: float) -> str:
         clip_on=True
     )
     
-    # Save with transparent background
-    output_path =  base_dir + '\\assets' + '\\normal.png'
-    plt.savefig(
-        output_path, 
-        format='png', 
+    # Encode with transparent background
+    return fig_to_uri(
+        fig,
+        fmt,
         dpi=200, 
         bbox_inches='tight', 
         pad_inches=0,
         transparent=True
     )
-    plt.close()
-    
-    return output_path
 
 
 def procent_validator(n):
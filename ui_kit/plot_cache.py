@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+PLOT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'metaboscan_plot_cache')
+PLOT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def plot_cache_key(*parts):
+    """Content hash of JSON-serializable plot inputs"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PlotCache:
+    """
+    Rendered plots (data URI strings) on disk, one file per content hash.
+
+    Least recently used entries (by file mtime, refreshed on every hit) are
+    evicted once the directory grows over max_bytes. Several processes may
+    share the directory; writes are atomic renames.
+    """
+
+    def __init__(self, directory=PLOT_CACHE_DIR, max_bytes=PLOT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None          # bytes on disk, counted on first write
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.uri")
+
+    def get(self, key):
+        """Cached value or None"""
+        path = self._path(key)
+        try:
+            with open(path, encoding='ascii') as f:
+                value = f.read()
+            os.utime(path)  # mark as recently used
+        except OSError:
+            value = None
+
+        with self._lock:
+            self._stats['hits' if value is not None else 'misses'] += 1
+        return value
+
+    def put(self, key, value):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='ascii') as f:
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Error writing plot cache: {str(e)}")
+            return
+
+        with self._lock:
+            self._stats['writes'] += 1
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += len(value)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith('.uri'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            pass
+        return entries
+
+    def _disk_usage(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Re-read the directory: other processes may have added or removed entries
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+        for _, file_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                size -= file_size
+                self._stats['evictions'] += 1
+            except OSError:
+                pass
+        self._size = size
+
+    def stats(self):
+        """hits / misses / writes / evictions since start of this process"""
+        with self._lock:
+            return dict(self._stats)
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._size = 0
+
+
+_plot_cache = None
+_plot_cache_lock = threading.Lock()
+
+
+def get_plot_cache():
+    """Process-wide plot cache"""
+    global _plot_cache
+    if _plot_cache is None:
+        with _plot_cache_lock:
+            if _plot_cache is None:
+                _plot_cache = PlotCache()
+    return _plot_cache
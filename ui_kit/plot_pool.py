@@ -0,0 +1,80 @@
+import importlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Worker processes for matplotlib figures (a report has 12 corridor plots)
+PLOT_WORKERS = min(12, os.cpu_count() or 1)
+
+_executor = None
+# Only long-lived processes (Streamlit, report_server) opt in with warm_up_plot_workers;
+# a one-report process (main.py) would spend more on starting workers than on drawing
+_warmed_up = False
+_executor_lock = threading.Lock()
+
+
+def _init_worker():
+    # pyplot is not thread-safe, but every worker process has its own Agg canvas
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def get_plot_executor():
+    """Shared process pool, started on first use and kept for the next reports"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: the parent (Streamlit / Flask) has threads, forking it is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=PLOT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def _preload(module_name):
+    importlib.import_module(module_name)
+
+
+def warm_up_plot_workers(module_name='ui_kit.dash_utilit'):
+    """
+    Start worker processes in the background and import the plotting module there
+    (takes seconds per worker). Only the first call per process does anything.
+    """
+    global _warmed_up
+    if PLOT_WORKERS <= 1 or _warmed_up:
+        return
+    _warmed_up = True
+    executor = get_plot_executor()
+    for _ in range(PLOT_WORKERS):
+        executor.submit(_preload, module_name)
+
+
+def shutdown_plot_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def render_plots(func, specs):
+    """
+    Call func(*args) for every args tuple in specs and return the results in order.
+
+    Runs in the process pool when the process has warmed it (warm_up_plot_workers)
+    and there is more than one plot, otherwise (or if the pool breaks) in the current process.
+    """
+    specs = list(specs)
+    if not _warmed_up or len(specs) <= 1:
+        return [func(*args) for args in specs]
+
+    try:
+        return list(get_plot_executor().map(func, *zip(*specs)))
+    except BrokenProcessPool as e:
+        print(f"Plot worker pool failed, rendering in process: {str(e)}")
+        shutdown_plot_executor()
+        return [func(*args) for args in specs]
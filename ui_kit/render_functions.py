@@ -3,8 +3,12 @@ import numpy as np
 import matplotlib.pyplot as plt
 from dash import dcc
 from dash import html
+import math
 import os
+from contextlib import contextmanager
+from PIL import Image
 from ui_kit.dash_utilit import *
+from ui_kit.plot_pool import render_plots
 
 
 BASE_DIR = os.path.dirname(
@@ -13,6 +17,20 @@ BASE_DIR = os.path.dirname(
 
 app = None
 
+# Chart format of the report being built (one of PLOT_FORMATS), set by create_report_layout
+plot_format = 'png'
+
+# While a batch is open (collect_coridor_plots) corridor plots are only described,
+# then render_collected_coridor_plots draws all of them at once
+_coridor_plot_batch = None
+
+# Display values of the report's metabolite rows, computed at once (batch_metabolite_rows)
+_metabolite_row_batch = None
+
+def radial_diagram_src(risk_scores):
+    """Radial diagram of the current report as data URI, in the report's plot format"""
+    return generate_radial_diagram(risk_scores, fmt=plot_format)
+
 def render_page_layout(header=None, content=None, footer=None):
     """
     Creates a standardized page layout with:
@@ -240,51 +258,46 @@ def render_main_header_report(name, date, age, gender):
     )
 
 
-def generate_radial_diagram(df_result, output_path):
-    """Generate radial diagram and save to specified path"""
-    # Ensure df_result is a DataFrame (not a file path)
-    if isinstance(df_result, str):
-        df_result = pd.read_excel(df_result)
-
-    # Process labels to split long ones into two lines
-    def split_label(label):
-        """Split label into two lines if total length exceeds 25 characters.
-        Words that would push the first line over 25 characters are moved to the second line.
-        """
-        if len(label) > 25:
-            words = label.split()
-            first_line = []
-            second_line = []
-            char_count = 0
-
-            for word in words:
-                # If adding this word would exceed 25 chars (including spaces), move it to second line
-                if char_count + len(word) > 35 and first_line:
-                    second_line.append(word)
-                else:
-                    first_line.append(word)
-                    char_count += len(word) + 1  # +1 for space
-
-            # Join the lines only if we actually split into two lines
-            if second_line:
-                return '\n'.join([' '.join(first_line), ' '.join(second_line)])
-
-        return label
-
-    labels = [split_label(label) for label in df_result['Группа риска'].tolist()]
-    risk_levels = df_result['Риск-скор'].tolist()
+def split_radial_label(label):
+    """Split label into two lines if total length exceeds 25 characters.
+    Words that would push the first line over 25 characters are moved to the second line.
+    """
+    if len(label) > 25:
+        words = label.split()
+        first_line = []
+        second_line = []
+        char_count = 0
 
-    num_vars = len(labels)
-    angles = np.linspace(0, 2 * np.pi, num_vars, endpoint=False).tolist()
+        for word in words:
+            # If adding this word would exceed 25 chars (including spaces), move it to second line
+            if char_count + len(word) > 35 and first_line:
+                second_line.append(word)
+            else:
+                first_line.append(word)
+                char_count += len(word) + 1  # +1 for space
+
+        # Join the lines only if we actually split into two lines
+        if second_line:
+            return '\n'.join([' '.join(first_line), ' '.join(second_line)])
+
+    return label
 
-    # Close the circle
-    risk_levels += risk_levels[:1]
-    angles += angles[:1]
 
+def _radial_figure():
     fig, ax = plt.subplots(figsize=(8, 6), subplot_kw=dict(polar=True))
     # Remove outer circle border
     ax.spines['polar'].set_visible(False)
+    return fig, ax
+
+
+def _radial_angles(num_vars):
+    angles = np.linspace(0, 2 * np.pi, num_vars, endpoint=False).tolist()
+    # Close the circle
+    return angles + angles[:1]
+
 
+def _draw_radial_background(ax, labels, angles):
+    """Colored score bands and group labels - the part that does not depend on the patient"""
     # Updated color scheme as specified
     colors = [
         '#c90909',  # 1 балл
@@ -304,20 +317,6 @@ def generate_radial_diagram(df_result, output_path):
     for i in range(len(levels) - 1):
         ax.fill_between(angles, levels[i], levels[i + 1], color=colors[i], alpha=0.3)
 
-    # Plot data with blue markers and white borders
-    ax.fill(angles, risk_levels, color='#2563eb', alpha=0.25)
-    ax.plot(
-        angles,
-        risk_levels,
-        color='#2563eb',
-        linewidth=2,
-        marker='o',
-        markersize=8,
-        markerfacecolor='#2563eb',
-        markeredgecolor='white',
-        markeredgewidth=1.5,
-    )
-
     ax.set_xticks(angles[:-1])
     ax.set_xticklabels(labels, fontsize=12, color='#404547')
 
@@ -334,15 +333,148 @@ def generate_radial_diagram(df_result, output_path):
         label.set_rotation(rotation)
         label.set_ha(ha)
         label.set_va('center')
-        ax.plot([angle, angle], [10, 10.5], color='gray', linestyle='-', linewidth=0.5, alpha=0.5)
 
     ax.tick_params(axis='x', zorder=1000, pad=0)
     ax.set_ylim(0, 10.5)
 
-    # Save the figure
-    fig.savefig(output_path, bbox_inches='tight', dpi=300)
+
+def _draw_radial_scores(ax, angles, risk_levels):
+    """
+    Patient's risk scores: blue polygon with markers, plus the spokes drawn over it
+    (grid lines of the axes are drawn over the polygon as well)
+    """
+    # Plot data with blue markers and white borders
+    ax.fill(angles, risk_levels, color='#2563eb', alpha=0.25)
+    ax.plot(
+        angles,
+        risk_levels,
+        color='#2563eb',
+        linewidth=2,
+        marker='o',
+        markersize=8,
+        markerfacecolor='#2563eb',
+        markeredgecolor='white',
+        markeredgewidth=1.5,
+    )
+    for angle in angles[:-1]:
+        ax.plot([angle, angle], [10, 10.5], color='gray', linestyle='-', linewidth=0.5, alpha=0.5)
+    ax.set_ylim(0, 10.5)
+
+
+# PNG backgrounds of the radial diagram by label set, see _radial_background
+_radial_backgrounds = {}
+RADIAL_BACKGROUND_CACHE_SIZE = 8
+RADIAL_DPI = 300
+# Bump when the radial diagram drawing changes (finished diagrams are kept in the plot cache)
+RADIAL_DIAGRAM_VERSION = 1
+
+
+def _radial_background(labels):
+    """
+    Background layer for a set of risk groups, rendered once per process:
+    (RGBA image, bounding box in inches every diagram with these labels is cropped to)
+    """
+    background = _radial_backgrounds.get(labels)
+    if background is not None:
+        return background
+
+    fig, ax = _radial_figure()
+    _draw_radial_background(ax, labels, _radial_angles(len(labels)))
+    # Grid and radius labels go on top of the patient polygon, they are drawn with it
+    ax.grid(False)
+    ax.set_yticklabels([])
+
+    # Same crop as bbox_inches='tight' (text extents depend on dpi, so measure at
+    # the output dpi); the patient polygon stays inside the axes, the labels alone define it
+    fig.set_dpi(RADIAL_DPI)
+    fig.canvas.draw()
+    bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(mpl.rcParams['savefig.pad_inches'])
+    buf = BytesIO()
+    fig.savefig(buf, format='rgba', dpi=RADIAL_DPI, bbox_inches=bbox)
     plt.close(fig)
 
+    # Size of the cropped canvas, as the Agg renderer truncates it
+    size = (int(bbox.width * RADIAL_DPI), int(bbox.height * RADIAL_DPI))
+    background = (Image.frombuffer('RGBA', size, buf.getvalue(), 'raw', 'RGBA', 0, 1), bbox)
+
+    if len(_radial_backgrounds) >= RADIAL_BACKGROUND_CACHE_SIZE:
+        _radial_backgrounds.clear()
+    _radial_backgrounds[labels] = background
+    return background
+
+
+def _composite_radial_png(labels, risk_levels):
+    """PNG bytes: patient layer drawn on a transparent canvas over the cached background"""
+    background, bbox = _radial_background(labels)
+    angles = _radial_angles(len(labels))
+
+    fig, ax = _radial_figure()
+    fig.patch.set_alpha(0)
+    ax.patch.set_alpha(0)
+    ax.set_xticks(angles[:-1])
+    ax.set_xticklabels([])
+    _draw_radial_scores(ax, angles, risk_levels)
+
+    buf = BytesIO()
+    fig.savefig(buf, format='rgba', dpi=RADIAL_DPI, bbox_inches=bbox, transparent=True)
+    plt.close(fig)
+    overlay = Image.frombuffer('RGBA', background.size, buf.getvalue(), 'raw', 'RGBA', 0, 1)
+
+    # Background is opaque, alpha channel would only make the PNG bigger and slower to encode
+    out = BytesIO()
+    Image.alpha_composite(background, overlay).convert('RGB').save(out, format='png', dpi=(RADIAL_DPI, RADIAL_DPI))
+    return out.getvalue()
+
+
+def generate_radial_diagram(df_result, output_path=None, fmt=None):
+    """
+    Generate radial diagram from the risk scores DataFrame.
+
+    Saved to output_path if given (format from its extension unless fmt is given),
+    otherwise returned as data URI - every report gets its own image, no shared file.
+    PNG is composed from a background cached per label set and the patient layer,
+    finished data URIs come from the plot cache when the same scores were drawn before.
+    """
+    labels = tuple(split_radial_label(label) for label in df_result['Группа риска'].tolist())
+    risk_levels = df_result['Риск-скор'].tolist()
+    # Close the circle
+    risk_levels += risk_levels[:1]
+
+    if output_path is not None:
+        fmt = fmt or os.path.splitext(output_path)[1].lstrip('.').lower() or 'png'
+    fmt = fmt or 'png'
+
+    if output_path is None:
+        cache = get_plot_cache()
+        key = plot_cache_key('radial_diagram', RADIAL_DIAGRAM_VERSION, fmt, labels,
+                             [float(level) for level in risk_levels])
+        uri = cache.get(key)
+        if uri is None:
+            data = _radial_diagram_bytes(labels, risk_levels, fmt)
+            uri = f"data:{PLOT_MIME_TYPES[fmt]};base64,{base64.b64encode(data).decode('ascii')}"
+            cache.put(key, uri)
+        return uri
+
+    with open(output_path, 'wb') as f:
+        f.write(_radial_diagram_bytes(labels, risk_levels, fmt))
+    return output_path
+
+
+def _radial_diagram_bytes(labels, risk_levels, fmt):
+    """Image file contents for split labels and closed risk_levels"""
+    if fmt == 'png':
+        return _composite_radial_png(labels, risk_levels)
+
+    # Vector output is cheap to draw in full
+    fig, ax = _radial_figure()
+    angles = _radial_angles(len(labels))
+    _draw_radial_background(ax, labels, angles)
+    _draw_radial_scores(ax, angles, risk_levels)
+    buf = BytesIO()
+    save_figure(fig, buf, fmt, dpi=RADIAL_DPI, bbox_inches='tight')
+    plt.close(fig)
+    return buf.getvalue()
+
 
 # [template_elements_img/group_params.png]
 def render_category_params(group_number, group_risk_name, risk_scores, ref_params):
@@ -788,6 +920,116 @@ def render_ml_score_card(title, subtitle, description, metrics, risk_scores):
     )
 
 
+class MetaboliteRowValues:
+    """
+    What a metabolite / ratio row shows besides names.
+
+    display      - rounded value (smart_round)
+    text_color   - value color (color_text_ref)
+    highlight    - value background (heighlight_out_of_range)
+    pointer      - pointer position on the bar, 0-100 (calculate_pointer_position)
+    status_color - 'blue' / 'red' / 'green' (get_status_color), None if not computed
+    status_text  - 'Снижен' / 'Повышен' / 'Норма' (get_status_text), None if not computed
+    """
+
+    __slots__ = ('display', 'text_color', 'highlight', 'pointer', 'status_color', 'status_text')
+
+    def __init__(self, display, text_color, highlight, pointer, status_color=None, status_text=None):
+        self.display = display
+        self.text_color = text_color
+        self.highlight = highlight
+        self.pointer = pointer
+        self.status_color = status_color
+        self.status_text = status_text
+
+
+def classify_metabolite_rows(metabolite_data, ref_stats):
+    """
+    Row values for every metabolite of the report in one pass.
+
+    Returns {id(ref_stats entry): (concentration, MetaboliteRowValues)}. Only metabolites with
+    a finite numeric concentration and a parsed norm range are included; rows for anything
+    else are computed one by one with the dash_utilit helpers, as before.
+    """
+    concentrations, entries, norms = [], [], []
+    for metabolite, concentration in metabolite_data.items():
+        entry = ref_stats.get(metabolite)
+        norm = entry.norm_range if isinstance(entry, RefStatsEntry) else None
+        if (norm is None or norm.max is None or not norm.min < norm.max
+                or isinstance(concentration, bool) or not isinstance(concentration, (int, float, np.number))
+                or not math.isfinite(concentration)):
+            continue
+        concentrations.append(concentration)
+        entries.append(entry)
+        norms.append(norm)
+
+    if not entries:
+        return {}
+
+    values = np.array(concentrations, dtype=np.float64)
+    ref_min = np.array([norm.min for norm in norms], dtype=np.float64)
+    ref_max = np.array([norm.max for norm in norms], dtype=np.float64)
+    decimals = [norm.decimals for norm in norms]
+
+    below = values < ref_min
+    above = values > ref_max
+    out_of_range = below | above
+    text_color = np.where(out_of_range, '#dc3545', '#404547').tolist()
+    highlight = np.where(out_of_range, '#f8d7da', 'white').tolist()
+    status_color = np.select([below, above], ['blue', 'red'], 'green').tolist()
+    status_text = np.select([below, above], ['Снижен', 'Повышен'], 'Норма').tolist()
+    # Same operations as calculate_pointer_position, rounded and clamped per value below
+    position = (((values - ref_min) / (ref_max - ref_min)) * 100).tolist()
+
+    # Python round() per value: np.round differs from it in the last digit for some values
+    rows = {}
+    for i, (entry, num, is_below, is_above) in enumerate(zip(entries, values.tolist(), below.tolist(), above.tolist())):
+        if is_below:
+            pointer = 0
+        elif is_above:
+            pointer = 100
+        else:
+            pointer = max(0, min(100, round(position[i], 2)))
+        display = round_nonzero(num, decimals[i]) if num != 0 else 0.0
+        rows[id(entry)] = (concentrations[i], MetaboliteRowValues(
+            display, text_color[i], highlight[i], pointer, status_color[i], status_text[i]))
+    return rows
+
+
+@contextmanager
+def batch_metabolite_rows(metabolite_data, ref_stats):
+    """Classify the report's metabolites once, rows rendered inside the block use the result"""
+    global _metabolite_row_batch
+    _metabolite_row_batch = classify_metabolite_rows(metabolite_data, ref_stats)
+    try:
+        yield _metabolite_row_batch
+    finally:
+        _metabolite_row_batch = None
+
+
+def batched_row_values(concentration, ref_stats_entry):
+    """MetaboliteRowValues from the open batch, None if the row is not in it"""
+    if _metabolite_row_batch is None:
+        return None
+    found = _metabolite_row_batch.get(id(ref_stats_entry))
+    if found is None or found[0] is not concentration and found[0] != concentration:
+        return None
+    return found[1]
+
+
+def metabolite_row_values(concentration, ref_stats_entry):
+    """MetaboliteRowValues of one metabolite row: from the batch, or computed here"""
+    row = batched_row_values(concentration, ref_stats_entry)
+    if row is not None:
+        return row
+    return MetaboliteRowValues(
+        display=smart_round(concentration, ref_stats_entry=ref_stats_entry),
+        text_color=color_text_ref(concentration, ref_stats_entry=ref_stats_entry),
+        highlight=heighlight_out_of_range(concentration, ref_stats_entry=ref_stats_entry),
+        pointer=calculate_pointer_position(concentration, ref_stats_entry=ref_stats_entry),
+    )
+
+
 # [template_elements_img/metabolite_row.png]
 def render_metabolite_row(concentration, ref_stats_entry, subtitle):
     """
@@ -800,6 +1042,7 @@ def render_metabolite_row(concentration, ref_stats_entry, subtitle):
     """
     # Determine if we should show the subtitle
     show_subtitle = bool(subtitle.strip())
+    row = metabolite_row_values(concentration, ref_stats_entry)
 
     progress_img = app.get_asset_url('progress.png')
     progress_left_img = app.get_asset_url( 'progress_left.png')
@@ -866,9 +1109,7 @@ def render_metabolite_row(concentration, ref_stats_entry, subtitle):
                                     'margin': '0px',
                                     'font-size': '13px',
                                     'font-family': 'Calibri',
-                                    'color': color_text_ref(
-                                        concentration, ref_stats_entry=ref_stats_entry
-                                    ),
+                                    'color': row.text_color,
                                     'display': 'flex',
                                     'align-items': 'center',
                                     'justify-content': 'center',
@@ -876,14 +1117,10 @@ def render_metabolite_row(concentration, ref_stats_entry, subtitle):
                                 children=[
                                     html.Div(
                                         html.B(
-                                            smart_round(
-                                                concentration, ref_stats_entry=ref_stats_entry
-                                            ),
+                                            row.display,
                                             style={
                                                 'text-align': 'center',
-                                                'background-color': heighlight_out_of_range(
-                                                    concentration, ref_stats_entry=ref_stats_entry
-                                                ),
+                                                'background-color': row.highlight,
                                                 'padding': '3px 8px',
                                                 'borderRadius': '12px',
                                             },
@@ -930,7 +1167,7 @@ def render_metabolite_row(concentration, ref_stats_entry, subtitle):
                                                     'position': 'absolute',
                                                     'height': '38px',
                                                     'width': '4px',
-                                                    'left': f'{calculate_pointer_position(concentration, ref_stats_entry=ref_stats_entry)}%',
+                                                    'left': f'{row.pointer}%',
                                                     'top': '50%',
                                                     'transform': 'translate(-50%, -50%)',
                                                 },
@@ -1429,7 +1666,14 @@ def render_ratios_header(order_number, title):
 def render_ratios_row(value, ref_stats_entry, description):
     """Render single ratio row with data from metabolite_data and ref_stats"""
     norm = ref_stats_entry["norm"]
-    status_color = get_status_color(value, norm)
+    row = batched_row_values(value, ref_stats_entry)
+    if row is not None:
+        status_color, status_text, display = row.status_color, row.status_text, row.display
+    else:
+        norm_range = entry_norm(ref_stats_entry)
+        status_color = get_status_color(value, norm_range)
+        status_text = get_status_text(value, norm_range)
+        display = smart_round(value, ref_stats_entry=ref_stats_entry)
 
     return html.Div(
         style={
@@ -1464,7 +1708,7 @@ def render_ratios_row(value, ref_stats_entry, description):
                 },
                 children=[
                     html.Div(
-                        smart_round(value, ref_stats_entry=ref_stats_entry),
+                        display,
                         style={
                             'fontWeight': 'bold',
                             'fontSize': '13px',
@@ -1489,7 +1733,7 @@ def render_ratios_row(value, ref_stats_entry, description):
             html.Div(
                 style={'gridColumn': 'span 1', 'textAlign': 'center'},
                 children=html.Span(
-                    get_status_text(value, norm),
+                    status_text,
                     style={
                         'padding': '3px 8px',
                         'borderRadius': '12px',
@@ -1532,17 +1776,53 @@ def render_ratios_row(value, ref_stats_entry, description):
 
 
 def render_coridor_plot(title, metabolites_dict, ref_stats):
+    style = {
+        'width': '100%',
+        'height': 'fit-content',
+        'object-fit': 'contain',
+    }
+    if _coridor_plot_batch is not None:
+        # Image is filled in later; z-scores are cheap, only the drawing is deferred
+        img = html.Img(src='', style=style)
+        data, highlight_green_metabolites = z_score_plot_data(metabolites_dict, ref_stats)
+        _coridor_plot_batch.append((img, (data, highlight_green_metabolites, [-1.54, 1.54], plot_format)))
+        return img
+
     fig_coridor = plot_metabolite_z_scores(
-        metabolite_concentrations=metabolites_dict, group_title=title, ref_stats=ref_stats
-    )
-    return html.Img(
-        src=fig_coridor,
-        style={
-            'width': '100%',
-            'height': 'fit-content',
-            'object-fit': 'contain',
-        },
+        metabolite_concentrations=metabolites_dict, group_title=title, ref_stats=ref_stats, fmt=plot_format
     )
+    return html.Img(src=fig_coridor, style=style)
+
+
+@contextmanager
+def collect_coridor_plots():
+    """Collect render_coridor_plot calls made inside the block, yields the batch list"""
+    global _coridor_plot_batch
+    batch = []
+    _coridor_plot_batch = batch
+    try:
+        yield batch
+    finally:
+        _coridor_plot_batch = None
+
+
+def render_collected_coridor_plots(batch):
+    """
+    Set the images of every collected plot: cached ones from the plot cache,
+    the rest drawn in parallel processes where possible
+    """
+    cache = get_plot_cache()
+    keys = [z_score_plot_key(*spec) for _, spec in batch]
+    sources = [cache.get(key) for key in keys]
+
+    missing = [i for i, src in enumerate(sources) if src is None]
+    drawn = render_plots(draw_metabolite_z_scores, [batch[i][1] for i in missing])
+    for i, src in zip(missing, drawn):
+        cache.put(keys[i], src)
+        sources[i] = src
+
+    for (img, _), src in zip(batch, sources):
+        img.src = src
 
 
 def render_questions_dialog():
@@ -2169,7 +2449,7 @@ def render_age_bell(age_score=0):
     procent_speed = (10 - age_score) * 10
     N = 1000
     a = 3.5
-    normal_dist(N, a, procent_speed)
+    bell_src = normal_dist(N, a, procent_speed, plot_format)
     status_text = get_text_from_procent(procent_speed)
     text_color= get_color_age_border(procent_speed)
     status_color= get_color_age(procent_speed)
@@ -2181,7 +2461,7 @@ def render_age_bell(age_score=0):
                 # Image container
                 html.Div([
                     html.Img(
-                        src=app.get_asset_url('normal.png'),
+                        src=bell_src,
                         style={'width': '100%'}
                     )
                 ], style={'height': 'fit-content'}),
@@ -0,0 +1,361 @@
+import base64
+import html as html_lib
+import json
+import mimetypes
+import numbers
+import os
+import re
+import textwrap
+from pathlib import Path
+
+import plotly
+from plotly.utils import PlotlyJSONEncoder
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS_DIR = os.path.join(base_dir, 'assets')
+# Sets window.__REPORT_READY__ when the page can be printed (served by Dash from assets/ as well)
+REPORT_READY_JS = 'report_ready.js'
+PLOTLY_JS_PATH = os.path.join(os.path.dirname(plotly.__file__), 'package_data', 'plotly.min.js')
+
+# Props that never end up in the DOM (callbacks / React internals)
+_SKIP_PROPS = {'children', 'style', 'n_clicks', 'n_clicks_timestamp', 'disable_n_clicks',
+               'loading_state', 'key', 'setProps'}
+# dcc components only put these on their wrapper div
+_WRAPPER_PROPS = ('id', 'className')
+_ATTR_NAMES = {'className': 'class', 'htmlFor': 'for'}
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+              'source', 'track', 'wbr'}
+
+# CSS properties where React does not append "px" to numbers
+_UNITLESS_STYLES = {
+    'animationIterationCount', 'aspectRatio', 'borderImageOutset', 'borderImageSlice',
+    'borderImageWidth', 'boxFlex', 'boxFlexGroup', 'boxOrdinalGroup', 'columnCount', 'columns',
+    'flex', 'flexGrow', 'flexPositive', 'flexShrink', 'flexNegative', 'flexOrder', 'gridArea',
+    'gridRow', 'gridRowEnd', 'gridRowSpan', 'gridRowStart', 'gridColumn', 'gridColumnEnd',
+    'gridColumnSpan', 'gridColumnStart', 'fontWeight', 'lineClamp', 'lineHeight', 'opacity',
+    'order', 'orphans', 'scale', 'tabSize', 'widows', 'zIndex', 'zoom', 'fillOpacity',
+    'floodOpacity', 'stopOpacity', 'strokeDasharray', 'strokeDashoffset', 'strokeMiterlimit',
+    'strokeOpacity', 'strokeWidth',
+}
+
+_ASSET_URL_RE = re.compile(r'/assets/([^"\')\s]+)')
+# Markdown block lines (CommonMark rules for the constructs report messages use)
+_HEADER_RE = re.compile(r'^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$')
+_SETEXT_RE = re.compile(r'^ {0,3}(=+|-+)[ \t]*$')
+_RULE_RE = re.compile(r'^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$')
+_BULLET_RE = re.compile(r'^ {0,3}([-*+])(?:[ \t]+(.*))?$')
+_NUMBERED_RE = re.compile(r'^ {0,3}(\d{1,9})([.)])(?:[ \t]+(.*))?$')
+
+# Inlined assets: path -> ((mtime, size), data URI)
+_data_uri_cache = {}
+
+
+class StaticAssets:
+    """
+    Drop-in for app.get_asset_url when the layout is rendered without a Dash server:
+    asset names resolve to file:// URLs, or to data URIs if inline is set.
+    """
+
+    def __init__(self, assets_dir=ASSETS_DIR, inline=False):
+        self.assets_dir = assets_dir
+        self.inline = inline
+
+    def get_asset_url(self, path):
+        file_path = os.path.join(self.assets_dir, path)
+        if self.inline:
+            return _file_data_uri(file_path)
+        return Path(file_path).resolve().as_uri()
+
+    def rewrite_urls(self, value):
+        """Replace /assets/<name> references inside a string (e.g. url("/assets/x.png"))"""
+        return _ASSET_URL_RE.sub(lambda m: self.get_asset_url(m.group(1)), value)
+
+
+def _file_data_uri(file_path):
+    stat = os.stat(file_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _data_uri_cache.get(file_path)
+    if cached is None or cached[0] != version:
+        mime = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        with open(file_path, 'rb') as f:
+            encoded = base64.b64encode(f.read()).decode('ascii')
+        cached = (version, f"data:{mime};base64,{encoded}")
+        _data_uri_cache[file_path] = cached
+    return cached[1]
+
+
+def _js_number(value):
+    """Number as React prints it (7.0 -> "7")"""
+    value = value.item() if hasattr(value, 'item') else value
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e21:
+        return str(int(value))
+    return str(value)
+
+
+def _css_name(name):
+    if name.startswith('--') or '-' in name:
+        return name
+    name = re.sub(r'([A-Z])', r'-\1', name).lower()
+    # WebkitTransform -> -webkit-transform, msTransform -> -ms-transform
+    if name.startswith(('webkit-', 'moz-', 'ms-', 'o-')):
+        name = '-' + name
+    return name
+
+
+def style_to_css(style, assets=None):
+    """Dash style dict -> inline CSS string, with React's px rules for numbers"""
+    declarations = []
+    for name, value in (style or {}).items():
+        if value is None or isinstance(value, bool) or value == '':
+            continue
+        if isinstance(value, numbers.Real):
+            camel_name = re.sub(r'-([a-z])', lambda m: m.group(1).upper(), name.lstrip('-'))
+            value = _js_number(value)
+            if camel_name not in _UNITLESS_STYLES and value != '0':
+                value += 'px'
+        else:
+            value = str(value).strip()
+            if assets is not None:
+                value = assets.rewrite_urls(value)
+        declarations.append(f"{_css_name(name)}: {value}")
+    return '; '.join(declarations)
+
+
+def _inline_markdown(text):
+    text = html_lib.escape(text, quote=False)
+    text = re.sub(r'`([^`]+)`', r'<code>\1</code>', text)
+    text = re.sub(r'\[([^\]]+)\]\(([^)\s]+)\)', r'<a href="\2">\1</a>', text)
+    text = re.sub(r'(\*\*|__)(?=\S)(.+?)(?<=\S)\1', r'<strong>\2</strong>', text)
+    text = re.sub(r'(?<![*\w])([*_])(?=\S)(.+?)(?<=\S)\1(?![*\w])', r'<em>\2</em>', text)
+    return re.sub(r' {2,}\n', '<br>\n', text)
+
+
+class _MarkdownBlocks:
+    """Line-by-line block parser state for markdown_to_html"""
+
+    def __init__(self):
+        self.parts = []
+        self.paragraph = []      # lines of the open paragraph
+        self.list_kind = None    # ('ul', marker) / ('ol', delimiter) of the open list
+        self.list_start = 1
+        self.items = []          # open list items, each a list of paragraphs (lists of lines)
+        self.loose = False       # blank lines between items: items are wrapped in <p>
+        self.blank = False       # previous line was blank
+
+    def close_paragraph(self):
+        if self.paragraph:
+            text = _inline_markdown('\n'.join(self.paragraph).rstrip())
+            self.parts.append(f"<p>{text}</p>")
+            self.paragraph = []
+
+    def close_list(self):
+        if self.list_kind is None:
+            return
+        tag = self.list_kind[0]
+        items = []
+        for paragraphs in self.items:
+            texts = [_inline_markdown('\n'.join(lines).rstrip()) for lines in paragraphs if lines]
+            if self.loose:
+                items.append('<li>' + ''.join(f"<p>{text}</p>" for text in texts) + '</li>')
+            else:
+                items.append('<li>' + '\n'.join(texts) + '</li>')
+        start = f' start="{self.list_start}"' if tag == 'ol' and self.list_start != 1 else ''
+        self.parts.append(f"<{tag}{start}>{''.join(items)}</{tag}>")
+        self.list_kind, self.items, self.loose = None, [], False
+
+    def close_all(self):
+        self.close_paragraph()
+        self.close_list()
+
+    def list_item(self, kind, start, text):
+        self.close_paragraph()
+        if self.list_kind != kind:
+            self.close_list()
+            self.list_kind, self.list_start = kind, start
+        elif self.blank:
+            self.loose = True
+        self.items.append([[text or '']])
+
+    def line(self, line):
+        if not line.strip():
+            self.close_paragraph()
+            self.blank = True
+            return
+
+        setext = _SETEXT_RE.match(line)
+        bullet = _BULLET_RE.match(line)
+        numbered = _NUMBERED_RE.match(line)
+        header = _HEADER_RE.match(line)
+
+        if setext and self.paragraph and not self.blank:
+            level = 1 if setext.group(1)[0] == '=' else 2
+            text = _inline_markdown('\n'.join(self.paragraph).rstrip())
+            self.paragraph = []
+            self.parts.append(f"<h{level}>{text}</h{level}>")
+        elif _RULE_RE.match(line):
+            self.close_all()
+            self.parts.append('<hr>')
+        elif header:
+            self.close_all()
+            level = len(header.group(1))
+            self.parts.append(f"<h{level}>{_inline_markdown(header.group(2) or '')}</h{level}>")
+        elif bullet and (bullet.group(2) or not self.paragraph):
+            self.list_item(('ul', bullet.group(1)), 1, bullet.group(2))
+        elif numbered and (numbered.group(3) or not self.paragraph) \
+                and (not self.paragraph or int(numbered.group(1)) == 1):
+            # Only a list starting at 1 may interrupt a paragraph
+            self.list_item(('ol', numbered.group(2)), int(numbered.group(1)), numbered.group(3))
+        elif self.list_kind is not None and not self.paragraph:
+            indented = len(line) - len(line.lstrip()) >= 2
+            if not self.blank:
+                self.items[-1][-1].append(line.strip())   # lazy continuation of the item
+            elif indented:
+                self.loose = True
+                self.items[-1].append([line.strip()])     # next paragraph of the item
+            else:
+                self.close_list()
+                self.paragraph.append(line.lstrip())
+        else:
+            self.paragraph.append(line.lstrip())
+        self.blank = False
+
+
+def markdown_to_html(text):
+    """
+    Markdown used in report messages, rendered the way dcc.Markdown (CommonMark) does:
+    paragraphs, # and underlined headers, bullet / numbered lists (also right after
+    a text line), rules, **bold**, *italic*, `code` and [links](url)
+    """
+    blocks = _MarkdownBlocks()
+    for line in textwrap.dedent(text or '').strip('\n').split('\n'):
+        blocks.line(line)
+    blocks.close_all()
+    return '\n'.join(blocks.parts)
+
+
+class _HtmlWriter:
+    """Walks a Dash component tree and collects HTML parts"""
+
+    def __init__(self, assets):
+        self.assets = assets
+        self.parts = []
+        self.graph_count = 0
+
+    def attrs(self, component, props=None):
+        attrs = []
+        for prop in props or component._prop_names:
+            if prop in _SKIP_PROPS or prop.startswith('n_'):
+                continue
+            value = getattr(component, prop, None)
+            if value is None or value is False:
+                continue
+            name = _ATTR_NAMES.get(prop, prop.lower() if not prop.startswith(('data-', 'aria-')) else prop)
+            if value is True:
+                attrs.append(f" {name}")
+                continue
+            value = _js_number(value) if isinstance(value, numbers.Real) else str(value)
+            if value.startswith('/assets/'):
+                value = self.assets.rewrite_urls(value)
+            attrs.append(f' {name}="{html_lib.escape(value, quote=True)}"')
+        css = style_to_css(getattr(component, 'style', None), self.assets)
+        if css:
+            attrs.append(f' style="{html_lib.escape(css, quote=True)}"')
+        return ''.join(attrs)
+
+    def write(self, node):
+        if node is None or isinstance(node, bool):
+            return
+        if isinstance(node, (list, tuple)):
+            for child in node:
+                self.write(child)
+            return
+        if isinstance(node, str):
+            self.parts.append(html_lib.escape(node, quote=False))
+            return
+        if isinstance(node, numbers.Real):
+            self.parts.append(_js_number(node))
+            return
+
+        namespace = getattr(node, '_namespace', '')
+        if namespace == 'dash_html_components':
+            self.write_html(node)
+        elif namespace == 'dash_core_components' and node._type == 'Markdown':
+            self.write_markdown(node)
+        elif namespace == 'dash_core_components' and node._type == 'Graph':
+            self.write_graph(node)
+        else:
+            raise ValueError(f"Static rendering is not supported for {namespace}.{node._type}")
+
+    def write_html(self, component):
+        tag = component._type.lower()
+        self.parts.append(f"<{tag}{self.attrs(component)}>")
+        if tag in _VOID_TAGS:
+            return
+        self.write(getattr(component, 'children', None))
+        self.parts.append(f"</{tag}>")
+
+    def write_markdown(self, component):
+        children = component.children
+        if isinstance(children, (list, tuple)):
+            children = '\n'.join(str(c) for c in children)
+        self.parts.append(f"<div{self.attrs(component, _WRAPPER_PROPS)}>")
+        self.parts.append(markdown_to_html(children))
+        self.parts.append("</div>")
+
+    def write_graph(self, component):
+        self.graph_count += 1
+        graph_id = getattr(component, 'id', None) or f"static-graph-{self.graph_count}"
+        figure = getattr(component, 'figure', None) or {}
+        if hasattr(figure, 'to_plotly_json'):
+            figure = figure.to_plotly_json()
+        config = {'displaylogo': False, **(getattr(component, 'config', None) or {})}
+
+        # dcc.Graph wraps the plot in a div that carries id/className/style
+        class_name = ' '.join(filter(None, ['dash-graph', getattr(component, 'className', None)]))
+        self.parts.append(f'<div{self.attrs(component, ("id",))} class="{html_lib.escape(class_name)}">')
+        self.parts.append(f'<div id="{html_lib.escape(str(graph_id))}-plot"></div>')
+        payload = ', '.join(
+            json.dumps(value, cls=PlotlyJSONEncoder).replace('</', '<\\/')
+            for value in (figure.get('data', []), figure.get('layout', {}), config)
+        )
+        self.parts.append(f"<script>Plotly.newPlot({json.dumps(str(graph_id) + '-plot')}, {payload});</script>")
+        self.parts.append("</div>")
+
+
+def component_to_html(component, assets=None):
+    """
+    Serialize Dash component tree to an HTML fragment.
+
+    Returns (html, has_graphs); graphs need plotly.js on the page.
+    """
+    writer = _HtmlWriter(assets or StaticAssets())
+    writer.write(component)
+    return ''.join(writer.parts), writer.graph_count > 0
+
+
+def render_html_document(layout, assets=None, title='Report'):
+    """Full HTML page for layout that Chromium can open and print from disk"""
+    assets = assets or StaticAssets()
+    body, has_graphs = component_to_html(layout, assets)
+
+    head = ['<meta charset="UTF-8">', f"<title>{html_lib.escape(title)}</title>"]
+    if has_graphs:
+        # Scripts in <head> run before the body is parsed, so Plotly is defined for every graph
+        if assets.inline:
+            with open(PLOTLY_JS_PATH, encoding='utf-8') as f:
+                head.append(f"<script>{f.read()}</script>")
+        else:
+            head.append(f'<script src="{Path(PLOTLY_JS_PATH).resolve().as_uri()}"></script>')
+
+    ready_script_path = os.path.join(assets.assets_dir, REPORT_READY_JS)
+    if assets.inline:
+        with open(ready_script_path, encoding='utf-8') as f:
+            ready_script = f"<script>{f.read()}</script>"
+    else:
+        ready_script = f'<script src="{Path(ready_script_path).resolve().as_uri()}"></script>'
+
+    return (
+        "<!DOCTYPE html>\n<html>\n<head>\n" + '\n'.join(head) + "\n</head>\n"
+        "<body>\n<div id=\"_dash-app-content\">" + body + "</div>\n"
+        + ready_script + "\n</body>\n</html>\n"
+    )